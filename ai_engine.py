@@ -1,10 +1,525 @@
-from openai import OpenAI
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import metrics
+
+# Job family -> keywords that identify it in a job title and in a task description.
+# Override with a JSON file of the same shape via SKILL_TAXONOMY_FILE.
+DEFAULT_TAXONOMY = {
+    'machining': {
+        'titles': ['machinist', 'cnc', 'lathe', 'mill operator'],
+        'tasks': ['lathe', 'mill', 'cnc', 'machine', 'turn', 'bore', 'drill', 'grind', 'deburr', 'shaft', 'fixture', 'tooling'],
+    },
+    'maintenance': {
+        'titles': ['maintenance', 'mechanic', 'millwright'],
+        'tasks': ['repair', 'fix', 'replace', 'leak', 'pump', 'motor', 'lubricat', 'broken', 'hvac', 'service', 'belt', 'bearing', 'hydraulic'],
+    },
+    'electrical': {
+        'titles': ['electrician', 'electrical'],
+        'tasks': ['wire', 'wiring', 'electrical', 'panel', 'circuit', 'breaker', 'outlet', 'lighting', 'harness', 'sensor'],
+    },
+    'welding': {
+        'titles': ['welder', 'welding', 'fabricator'],
+        'tasks': ['weld', 'fabricat', 'bracket', 'frame', 'seam', 'tig', 'mig', 'braze'],
+    },
+    'composites': {
+        'titles': ['composite', 'layup', 'laminator'],
+        'tasks': ['layup', 'lay-up', 'cure', 'autoclave', 'composite', 'carbon', 'prepreg', 'resin', 'laminat', 'bagging'],
+    },
+    'assembly': {
+        'titles': ['assembler', 'assembly', 'mechanic'],
+        'tasks': ['assembl', 'install', 'mount', 'fasten', 'rivet', 'torque', 'fit'],
+    },
+    'quality': {
+        'titles': ['quality', 'inspector', 'qa', 'qc', 'metrology'],
+        'tasks': ['inspect', 'measure', 'audit', 'calibrat', 'verify', 'ndt', 'first article', 'cmm', 'gauge'],
+    },
+    'logistics': {
+        'titles': ['material handler', 'forklift', 'shipping', 'receiving', 'logistics', 'warehouse'],
+        'tasks': ['deliver', 'forklift', 'ship', 'receive', 'inventory', 'stock', 'pallet', 'unload', 'move', 'kit'],
+    },
+    'facilities': {
+        'titles': ['janitor', 'custodian', 'facilities', 'cleaner'],
+        'tasks': ['clean', 'sweep', 'trash', 'spill', 'mop', 'wash'],
+    },
+}
+
+
+def _openai():
+    # Imported on first model call: openai pulls in httpx and pydantic, which dominate startup
+    import openai
+    return openai
+
+
+# One pooled HTTP client per process, shared by every engine and thread: connections
+# (and their TLS sessions) are kept alive and reused instead of set up per call.
+_http_client = None
+_http_lock = threading.Lock()
+
+
+def shared_http_client():
+    """The process-wide httpx client for model calls, configured from AI_HTTP_* settings."""
+    global _http_client
+    if _http_client is None:
+        with _http_lock:
+            if _http_client is None:
+                import httpx
+                options = dict(
+                    limits=httpx.Limits(max_connections=int(os.getenv('AI_HTTP_MAX_CONNECTIONS', 20)),
+                                        max_keepalive_connections=int(os.getenv('AI_HTTP_MAX_KEEPALIVE', 10)),
+                                        keepalive_expiry=float(os.getenv('AI_HTTP_KEEPALIVE_EXPIRY', 60))),
+                    timeout=httpx.Timeout(float(os.getenv('AI_TIMEOUT', 15)), connect=float(os.getenv('AI_HTTP_CONNECT_TIMEOUT', 5))),
+                )
+                # The SDK's httpx subclass keeps its defaults (redirects, proxy handling from the environment)
+                client_class = _openai().DefaultHttpxClient
+                try:
+                    _http_client = client_class(http2=os.getenv('AI_HTTP2', '0') == '1', **options)
+                except ImportError:  # HTTP/2 needs the optional h2 package
+                    _http_client = client_class(**options)
+    return _http_client
+
+
+def _reset_http_client():
+    # A forked child must not share the parent's sockets (or a lock a parent thread held)
+    global _http_client, _http_lock
+    _http_client = None
+    _http_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_http_client)
+
+
+def _retryable():
+    # Errors worth retrying; anything else (bad request, auth) fails straight away
+    openai = _openai()
+    return (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9]+(?:-[a-z0-9]+)?", str(text or '').lower())
+
+
+def _urgency(task):
+    try:
+        return int(task.get('urgency') or 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def _task_signature(task):
+    """Id-free identity of a task, so cached answers survive tasks being re-created."""
+    return [' '.join(_words(task['description'])), _urgency(task)]
+
+
+def _model_id(value):
+    """A task id from model output as an int, or None if it isn't one (lists, floats, text...)."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+
+def _field(value):
+    return ' '.join(str(value or '').replace('|', '/').split())
+
+
+def _compact_workers(workers):
+    return '\n'.join(f"{_field(w['name'])}|{_field(w['job_title'])}" for w in workers)
+
+
+def _compact_tasks(tasks):
+    return '\n'.join(f"{t['id']}|{_urgency(t)}|{_field(t['description'])}" for t in tasks)
+
+
+def _claim(tasks, signature, taken):
+    """Id of the first task matching a cached signature that hasn't been handed out yet."""
+    for t in tasks:
+        if t['id'] not in taken and _task_signature(t) == signature:
+            taken.add(t['id'])
+            return t['id']
+    return None
+
+
+def _hungarian(cost):
+    """Minimum-cost assignment for an n x m matrix with n <= m. Returns the column for each row."""
+    n, m = len(cost), len(cost[0])
+    INF = float('inf')
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [INF] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0, delta, j1 = p[j0], INF, 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j], way[j] = cur, j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    result = [None] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            result[p[j] - 1] = j - 1
+    return result
+
+
+class LocalMatcher:
+    """Keyword-taxonomy matcher that settles the obvious assignments without a model call."""
+
+    # Urgency dominates the pair weight; keyword overlap only breaks ties within a level
+    URGENCY_WEIGHT = 100
+    # The exact solve is O(n²·m) in pure Python; larger components are matched greedily,
+    # most urgent and best-fitting pairs first
+    EXACT_MAX_CELLS = int(os.getenv('MATCH_EXACT_MAX_CELLS', 10000))
+
+    def __init__(self, taxonomy=None):
+        if taxonomy is None and os.getenv('SKILL_TAXONOMY_FILE'):
+            with open(os.getenv('SKILL_TAXONOMY_FILE')) as f:
+                taxonomy = json.load(f)
+        self.taxonomy = taxonomy or DEFAULT_TAXONOMY
+
+    def _hits(self, text, keywords):
+        """Counts keywords present in text; single words match as prefixes ('repair' -> 'repairs')."""
+        words = _words(text)
+        padded = f" {' '.join(words)} "
+        return sum(1 for k in keywords if (f' {k} ' in padded if ' ' in k else any(w.startswith(k) for w in words)))
+
+    def families(self, job_title):
+        return {f for f, spec in self.taxonomy.items() if self._hits(job_title, spec['titles'])}
+
+    def task_families(self, description):
+        return {f: h for f, spec in self.taxonomy.items() for h in [self._hits(description, spec['tasks'])] if h}
+
+    def score(self, worker_families, task_families):
+        return sum(task_families.get(f, 0) for f in worker_families)
+
+    def assign(self, workers, tasks):
+        """Returns ({worker name: task id}, unrecognised workers, unclassified tasks)."""
+        titles = {}
+        for w in workers:
+            if w['job_title'] not in titles:
+                titles[w['job_title']] = self.families(w['job_title'])
+        worker_fams = [titles[w['job_title']] for w in workers]
+        task_fams = [self.task_families(t['description']) for t in tasks]
+        # Each worker's candidate tasks, best first. Weights depend only on the worker's set of
+        # families, so tasks are ranked once per distinct set. A worker never needs more than
+        # len(workers) of them: at most len(workers) - 1 can be taken by others, so this is
+        # exact for a max-weight matching.
+        uw = self.URGENCY_WEIGHT
+        ranked = {}
+        for fams in {frozenset(wf) for wf in worker_fams if wf}:
+            scored = ((self.score(fams, tf), ti) for ti, tf in enumerate(task_fams) if tf)
+            ranked[fams] = sorted(((_urgency(tasks[ti]) * uw + min(s, uw - 1), ti) for s, ti in scored if s),
+                                  key=lambda e: (-e[0], e[1]))[:len(workers)]
+        candidates = {wi: ranked[frozenset(wf)] for wi, wf in enumerate(worker_fams) if wf and ranked[frozenset(wf)]}
+        edges = {(wi, ti): w for wi, cands in candidates.items() for w, ti in cands}
+
+        matches = {}
+        exact = len(edges) <= self.EXACT_MAX_CELLS
+        if not exact:
+            for wi, ti in self._greedy(edges):
+                matches[workers[wi]['name']] = tasks[ti]['id']
+        for comp_workers, comp_tasks in self._components(edges) if exact else ():
+            # Same bound within a component, which is usually much tighter
+            comp_edges = {(wi, ti): w for wi in comp_workers for w, ti in candidates[wi][:len(comp_workers)]}
+            comp_tasks = sorted({ti for _, ti in comp_edges})
+            if len(comp_workers) * len(comp_tasks) > self.EXACT_MAX_CELLS:
+                for wi, ti in self._greedy(comp_edges):
+                    matches[workers[wi]['name']] = tasks[ti]['id']
+                continue
+            rows, cols = comp_workers, comp_tasks
+            transpose = len(rows) > len(cols)
+            if transpose:
+                rows, cols = cols, rows
+            weight = lambda r, c: comp_edges.get((c, r) if transpose else (r, c), 0)
+            top = max(weight(r, c) for r in rows for c in cols)
+            picks = _hungarian([[top - weight(r, c) for c in cols] for r in rows])
+            for r, ci in zip(rows, picks):
+                c = cols[ci]
+                wi, ti = (c, r) if transpose else (r, c)
+                if (wi, ti) in comp_edges:
+                    matches[workers[wi]['name']] = tasks[ti]['id']
+
+        unknown_workers = [w for w, wf in zip(workers, worker_fams) if not wf]
+        unclassified_tasks = [t for t, tf in zip(tasks, task_fams) if not tf]
+        return matches, unknown_workers, unclassified_tasks
+
+    @staticmethod
+    def _greedy(edges):
+        """Highest-weight pairs first (urgency, then keyword fit); each side used once."""
+        used_workers, used_tasks = set(), set()
+        for (wi, ti), _ in sorted(edges.items(), key=lambda e: (-e[1], e[0])):
+            if wi not in used_workers and ti not in used_tasks:
+                used_workers.add(wi)
+                used_tasks.add(ti)
+                yield wi, ti
+
+    def _components(self, edges):
+        """Splits the worker/task graph into connected components so each solve stays small."""
+        parent = {}
+
+        def find(x):
+            while parent.setdefault(x, x) != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for wi, ti in edges:
+            parent[find(('w', wi))] = find(('t', ti))
+        groups = {}
+        for node in list(parent):
+            groups.setdefault(find(node), []).append(node)
+        for nodes in groups.values():
+            yield sorted(i for kind, i in nodes if kind == 'w'), sorted(i for kind, i in nodes if kind == 't')
+
+    def best_task(self, worker, tasks):
+        """Most urgent, best-matching task for one worker, or None when nothing fits."""
+        wf = self.families(worker['job_title'])
+        scored = [(_urgency(t), s, t) for t in tasks for s in [self.score(wf, self.task_families(t['description']))] if s]
+        if not scored:
+            return None
+        return max(scored, key=lambda x: (x[0], x[1]))[2]
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL store for model answers, optionally persisted to a JSON file."""
+
+    def __init__(self, maxsize=256, ttl=3600, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            if self.path:
+                self._save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data),
+                    'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0}
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                now = time.time()
+                for key, (expires, value) in json.load(f).items():
+                    if expires > now:
+                        self._data[key] = (expires, value)
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and lets one trial call through every `reset_after` seconds."""
+
+    def __init__(self, threshold=5, reset_after=30):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_after else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                self.opened_at = time.monotonic()  # one trial per window
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
 
 class AIEngine:
-    def __init__(self, api_key):
-        # http_client=None resolves potential proxy issues on some cloud hosts
-        self.client = OpenAI(api_key=api_key, http_client=None)
+    # Bulk model calls are split into chunks of this many workers, each offered
+    # CANDIDATES_PER_WORKER tasks, so prompt size stays flat as the pools grow.
+    CHUNK_WORKERS = 15
+    CANDIDATES_PER_WORKER = 4
+
+    def __init__(self, api_key, taxonomy=None, cache=None):
+        # Whole-call deadline (all attempts included) and retry policy; the SDK's own retries are off
+        self.timeout = float(os.getenv('AI_TIMEOUT', 15))
+        self.max_retries = int(os.getenv('AI_MAX_RETRIES', 2))
+        self.backoff = 0.5
+        self.api_key = api_key
+        # Client and thread pool are built on first use, so importing the app stays cheap
+        # and a preloading gunicorn master never forks live connections or threads.
+        self._client = None
+        self._executor = None
+        self._lazy_lock = threading.Lock()
+        self.breaker = CircuitBreaker(int(os.getenv('AI_BREAKER_THRESHOLD', 5)), float(os.getenv('AI_BREAKER_RESET', 30)))
+        self.matcher = LocalMatcher(taxonomy)
+        self.cache = cache or ResponseCache(
+            maxsize=int(os.getenv('AI_CACHE_SIZE', 256)),
+            ttl=float(os.getenv('AI_CACHE_TTL', 3600)),
+            path=os.getenv('AI_CACHE_FILE'),
+        )
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def client(self):
+        """The OpenAI client, or None without an API key."""
+        if self._client is None and self.api_key:
+            with self._lazy_lock:
+                if self._client is None:
+                    self._client = _openai().OpenAI(api_key=self.api_key, http_client=shared_http_client(), max_retries=0)
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lazy_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=int(os.getenv('AI_MAX_CONCURRENCY', 4)), thread_name_prefix='ai')
+        return self._executor
+
+    def _after_fork(self):
+        # The parent's client and pool threads are not usable in a forked child
+        self._lazy_lock = threading.Lock()
+        self._client = None
+        self._executor = None
+
+    def cache_stats(self):
+        return dict(self.cache.stats(), circuit=self.breaker.state)
+
+    def _complete(self, prompt):
+        """One JSON chat completion under the deadline, retry and circuit-breaker policy. None on failure."""
+        if self.client is None:
+            return None
+        if not self.breaker.allow():
+            metrics.inc('qarbon_ai_requests_total', outcome='circuit_open')
+            return None
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                with metrics.span('ai_completion'):
+                    response = self.client.chat.completions.create(
+                        model="gpt-4o",
+                        messages=[{"role": "user", "content": prompt}],
+                        response_format={"type": "json_object"},
+                        timeout=remaining,
+                    )
+            except _retryable():
+                metrics.inc('qarbon_ai_requests_total', outcome='retryable_error')
+                if attempt < self.max_retries:
+                    pause = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                    time.sleep(max(0, min(pause, deadline - time.monotonic())))
+                continue
+            except _openai().APIError:
+                metrics.inc('qarbon_ai_requests_total', outcome='error')
+                return None
+            except Exception:
+                # Anything else from the client still means no answer, not a crashed request
+                metrics.inc('qarbon_ai_requests_total', outcome='error')
+                self.breaker.record_failure()
+                return None
+            metrics.inc('qarbon_ai_requests_total', outcome='ok')
+            usage = getattr(response, 'usage', None)
+            if usage:
+                metrics.inc('qarbon_ai_tokens_total', usage.prompt_tokens or 0, kind='prompt')
+                metrics.inc('qarbon_ai_tokens_total', usage.completion_tokens or 0, kind='completion')
+            self.breaker.record_success()
+            try:
+                result = json.loads(response.choices[0].message.content)
+            except (TypeError, ValueError):
+                return None
+            return result if isinstance(result, dict) else None
+        self.breaker.record_failure()
+        return None
+
+    def get_single_qualified_assignment_async(self, worker, tasks):
+        """Runs get_single_qualified_assignment on the engine's thread pool and returns a Future."""
+        return self._pool().submit(self.get_single_qualified_assignment, worker, tasks)
 
     def assign_tasks_one_per_person(self, workers, tasks):
         """Bulk matching logic ensuring Job Title fits Task Description."""
@@ -15,39 +530,121 @@ class AIEngine:
         if not available_tasks or not available_workers:
             return {}
 
-        prompt = f"""
-        Assign ONE task to each worker. 
-        MANDATORY: Matching worker 'job_title' to 'description'. 
-        Example: Maintenance roles get repairs; Machinists get lathe work.
-        WORKERS: {json.dumps(available_workers)}
-        TASKS: {json.dumps(available_tasks)}
-        Return JSON ONLY: {{"WorkerName": [TaskRowNumber]}}
-        """
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-            return json.loads(response.choices[0].message.content)
-        except:
+        matches, _, unclassified_tasks = self.matcher.assign(available_workers, available_tasks)
+        assignments = {name: [task_id] for name, task_id in matches.items()}
+
+        # Only tasks the taxonomy can't classify go to the model, offered to every worker the
+        # matcher left unassigned; a recognised role can still fit them (as in the single path)
+        taken = set(matches.values())
+        unmatched_workers = [w for w in available_workers if w['name'] not in matches]
+        unclassified_tasks = [t for t in unclassified_tasks if t['id'] not in taken]
+        if unmatched_workers and unclassified_tasks:
+            for name, task_ids in self._llm_assign_chunked(unmatched_workers, unclassified_tasks).items():
+                if name not in assignments and task_ids[0] not in taken:
+                    taken.add(task_ids[0])
+                    assignments[name] = task_ids
+        return assignments
+
+    def _chunk(self, workers, tasks):
+        """Groups workers by title and routes each task to the chunk whose titles share the most words with it."""
+        workers = sorted(workers, key=lambda w: ' '.join(_words(w['job_title'])))
+        chunks = [(workers[i:i + self.CHUNK_WORKERS], []) for i in range(0, len(workers), self.CHUNK_WORKERS)]
+        vocab = [{word for w in chunk_workers for word in _words(w['job_title'])} for chunk_workers, _ in chunks]
+        for t in sorted(tasks, key=_urgency, reverse=True):
+            words = set(_words(t['description']))
+            open_chunks = [i for i, (cw, ct) in enumerate(chunks) if len(ct) < len(cw) * self.CANDIDATES_PER_WORKER]
+            if not open_chunks:
+                break
+            best = max(open_chunks, key=lambda i: (len(words & vocab[i]), -len(chunks[i][1])))
+            chunks[best][1].append(t)
+        return [(cw, ct) for cw, ct in chunks if ct]
+
+    def _llm_assign_chunked(self, workers, tasks):
+        """Sends the chunks concurrently and merges them, dropping unknown names/ids and double bookings."""
+        chunks = self._chunk(workers, tasks)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(chunks), int(os.getenv('AI_MAX_CONCURRENCY', 4))))) as pool:
+            results = list(pool.map(lambda c: self._llm_assign(*c), chunks))
+        merged, taken = {}, set()
+        for (chunk_workers, chunk_tasks), result in zip(chunks, results):
+            names = {_field(w['name']): w['name'] for w in chunk_workers}
+            ids = {t['id'] for t in chunk_tasks}
+            for name, task_ids in result.items():
+                name = names.get(_field(name))
+                if not name or name in merged or not isinstance(task_ids, list) or not task_ids:
+                    continue
+                task_id = _model_id(task_ids[0])
+                if task_id in ids and task_id not in taken:
+                    taken.add(task_id)
+                    merged[name] = [task_id]
+        return merged
+
+    def _llm_assign(self, available_workers, available_tasks):
+        if self.client is None:
             return {}
+        key = self.cache.key('bulk', sorted((w['name'], ' '.join(_words(w['job_title']))) for w in available_workers),
+                             sorted(_task_signature(t) for t in available_tasks))
+        cached = self.cache.get(key)
+        if cached is not None:
+            taken = set()
+            return {name: [task_id] for name, sig in cached.items() for task_id in [_claim(available_tasks, sig, taken)] if task_id is not None}
+
+        by_id = {t['id']: t for t in available_tasks}
+        result = self._llm_assign_uncached(available_workers, available_tasks)
+        if not isinstance(result, dict):
+            return {}
+        # Keep only {name: [task id]} entries; anything else in the reply counts as no answer
+        result = {name: [task_id] for name, ids in result.items()
+                  if isinstance(ids, list) and ids for task_id in [_model_id(ids[0])] if task_id is not None}
+        self.cache.put(key, {name: _task_signature(by_id[ids[0]]) for name, ids in result.items() if ids[0] in by_id})
+        return result
+
+    def _llm_assign_uncached(self, available_workers, available_tasks):
+        prompt = f"""Assign at most ONE task to each worker and each task to at most one worker.
+MANDATORY: Match worker job title to task description; leave a worker out if nothing fits.
+Example: Maintenance roles get repairs; Machinists get lathe work.
+WORKERS (name|job title):
+{_compact_workers(available_workers)}
+TASKS (id|urgency 1-5|description):
+{_compact_tasks(available_tasks)}
+Return JSON ONLY: {{"WorkerName": [TaskId]}}"""
+        return self._complete(prompt)
 
     def get_single_qualified_assignment(self, worker, tasks):
         """AI validation for individual 'Assign' button clicks."""
-        prompt = f"""
-        Find the single best-qualified task for this specific worker.
-        WORKER: {worker['name']} ({worker['job_title']})
-        TASKS: {json.dumps(tasks)}
-        Logic: Match role to task nature. If no task fits their title, return row_number as null.
-        Return JSON ONLY: {{"row_number": 123}}
-        """
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-            return json.loads(response.choices[0].message.content)
-        except:
+        if self.matcher.families(worker['job_title']):
+            task = self.matcher.best_task(worker, tasks)
+            if task:
+                return {'id': task['id']}
+            # A recognised role can still fit a task the taxonomy has no words for
+            tasks = [t for t in tasks if not self.matcher.task_families(t['description'])]
+            if not tasks:
+                return {'id': None}
+        return self._llm_single(worker, tasks)
+
+    def _llm_single(self, worker, tasks):
+        if self.client is None:
             return None
+        key = self.cache.key('single', ' '.join(_words(worker['job_title'])), sorted(_task_signature(t) for t in tasks))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return {'id': _claim(tasks, cached['task'], set()) if cached['task'] else None}
+
+        by_id = {t['id']: t for t in tasks}
+        result = self._llm_single_uncached(worker, tasks)
+        if not isinstance(result, dict):
+            return None
+        task_id = _model_id(result.get('id'))
+        if task_id is None and result.get('id') is not None:
+            return None  # malformed id: no answer, and nothing to cache
+        if task_id is None or task_id in by_id:
+            self.cache.put(key, {'task': _task_signature(by_id[task_id]) if task_id is not None else None})
+        return {'id': task_id}
+
+    def _llm_single_uncached(self, worker, tasks):
+        prompt = f"""Find the single best-qualified task for this specific worker.
+WORKER: {_field(worker['name'])} ({_field(worker['job_title'])})
+TASKS (id|urgency 1-5|description):
+{_compact_tasks(tasks)}
+Logic: Match role to task nature. If no task fits their title, return id as null.
+Return JSON ONLY: {{"id": 123}}"""
+        return self._complete(prompt)
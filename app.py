@@ -1,71 +1,357 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, send_from_directory, send_file, abort
 from flask_cors import CORS
 from excel_handler import ExcelHandler
 from ai_engine import AIEngine
+from jobs import JobQueue, QueueFull
+import metrics
+from openpyxl import load_workbook
+from concurrent.futures import TimeoutError as FutureTimeout
+import csv
+import io
+import json
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
-app = Flask(__name__, static_folder='static')
-CORS(app)
+bp = Blueprint('qarbon', __name__)
 
-excel_handler = ExcelHandler()
-ai_engine = AIEngine(os.getenv("OPENAI_API_KEY"))
+# Set by create_app(); importing this module builds nothing
+excel_handler = None
+ai_engine = None
+jobs = None
+_app = None
+_app_lock = threading.Lock()
 
-@app.route('/')
+def create_app(warm=True):
+    """Builds the Flask app and its services.
+
+    With warm=True both sheets are parsed and indexed up front, so under
+    `gunicorn --preload` the forked workers start with (and share) the parsed data.
+    """
+    global excel_handler, ai_engine, jobs
+    app = Flask(__name__, static_folder='static')
+    CORS(app)
+    excel_handler = ExcelHandler()
+    ai_engine = AIEngine(os.getenv("OPENAI_API_KEY"))
+    jobs = JobQueue(os.path.join(excel_handler.data_dir, 'jobs'),
+                    workers=int(os.getenv('JOB_WORKERS', 1)), maxsize=int(os.getenv('JOB_QUEUE_SIZE', 8)))
+    metrics.gauge('qarbon_ai_cache_hits', lambda: ai_engine.cache.hits, 'Model answers served from the response cache')
+    metrics.gauge('qarbon_ai_cache_misses', lambda: ai_engine.cache.misses, 'Response cache lookups that went to the model')
+    metrics.gauge('qarbon_event_subscribers', lambda: len(excel_handler._subscribers), 'Open /api/events streams')
+    metrics.gauge('qarbon_pending_writes', lambda: len(excel_handler._pending), 'Task updates buffered by write-behind')
+    app.register_blueprint(bp)
+    if warm:
+        excel_handler.warm()
+    return app
+
+def __getattr__(name):
+    # `gunicorn app:app` and `from app import app` still work; the app is built on first access
+    global _app
+    if name != 'app':
+        raise AttributeError(name)
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+    return _app
+
+@bp.before_app_request
+def start_timer():
+    if metrics.ENABLED:
+        g.metrics_start = metrics.start_request()
+
+@bp.after_app_request
+def record_timing(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    spans = metrics.finish_request()
+    # The rule, not the path, keeps label cardinality bounded
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('qarbon_http_request_seconds', elapsed, route=route, method=request.method, status=response.status_code)
+    if metrics.SERVER_TIMING:
+        response.headers['Server-Timing'] = metrics.server_timing(spans, elapsed)
+    return response
+
+@bp.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/')
 def route_index(): 
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_from_directory(current_app.static_folder, 'index.html')
 
-@app.route('/manager')
+@bp.route('/manager')
 def route_manager(): 
-    return send_from_directory(app.static_folder, 'manager.html')
+    return send_from_directory(current_app.static_folder, 'manager.html')
+
+def conditional_json(version, build):
+    """Answers 304 when the client already holds `version`, otherwise serialises build()."""
+    if request.if_none_match.contains_weak(version):
+        response = current_app.response_class(status=304)
+    else:
+        payload = build()
+        with metrics.span('json'):
+            response = jsonify(payload)
+    response.set_etag(version, weak=True)
+    # Let browsers keep the body but revalidate it on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+TASK_FILTERS = ('status', 'urgency', 'assignee', 'cursor', 'limit')
 
-@app.route('/api/tasks', methods=['GET'])
+@bp.route('/api/tasks', methods=['GET'])
 def get_tasks(): 
-    return jsonify(excel_handler.read_tasks())
+    if not any(k in request.args for k in TASK_FILTERS):
+        return conditional_json(excel_handler.version('tasks'), excel_handler.read_tasks)
+    status = request.args.get('status')
+    if status not in (None, 'open', 'completed'):
+        return jsonify({'success': False, 'message': 'status must be open or completed'}), 400
+    urgency = request.args.get('urgency')
+    urgency = [u for u in urgency.split(',') if u] if urgency else None
+    limit = request.args.get('limit', type=int)
+    limit = None if limit is None else min(max(limit, 1), 500)
+    # Versioned before the query, which is skipped entirely on a matching If-None-Match
+    version = excel_handler.version('tasks')
+    next_cursor = []
+    def build():
+        page, cursor = excel_handler.query_tasks(status, urgency, request.args.get('assignee'),
+                                                 request.args.get('cursor', type=int), limit)
+        next_cursor.append(cursor)
+        return page
+    response = conditional_json(version, build)
+    if next_cursor and next_cursor[0] is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor[0])
+    return response
 
-@app.route('/api/workers', methods=['GET'])
+@bp.route('/api/workers', methods=['GET'])
 def get_workers(): 
-    return jsonify(excel_handler.read_workers())
+    return conditional_json(excel_handler.version('workers'), excel_handler.read_workers)
+
+@bp.route('/api/worker-tasks/<name>', methods=['GET'])
+def get_worker_tasks(name):
+    status = request.args.get('status', 'open')
+    if status not in ('open', 'completed', 'all'):
+        return jsonify({'success': False, 'message': 'status must be open, completed or all'}), 400
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    # Versioned before the read: a write in between only costs the client one extra 200
+    version = excel_handler.version('tasks')
+    total = []
+    def build():
+        page, count = excel_handler.read_worker_tasks(name, status, offset, limit)
+        total.append(count)
+        return page
+    response = conditional_json(version, build)
+    if total:
+        response.headers['X-Total-Count'] = str(total[0])
+    return response
+
+@bp.route('/api/snapshot', methods=['GET'])
+def get_snapshot():
+    return conditional_json(excel_handler.version(), excel_handler.snapshot)
+
+# Streams are recycled periodically (EventSource reconnects on its own) and check for
+# changes made by other worker processes whenever they have been quiet for a while.
+SSE_MAX_SECONDS = int(os.getenv('SSE_MAX_SECONDS', 300))
+SSE_POLL_SECONDS = float(os.getenv('SSE_POLL_SECONDS', 5))
+# Each open stream holds a request thread, so only a fraction of a worker's threads may
+# stream; past that, clients get 503 and poll /api/snapshot instead.
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', max(1, int(os.getenv('GUNICORN_THREADS', 16)) // 4)))
+
+def sse(event):
+    return f"data: {json.dumps(event, default=str)}\n\n"
+
+@bp.route('/api/events', methods=['GET'])
+def stream_events():
+    q = excel_handler.subscribe(limit=SSE_MAX_STREAMS)
+    if q is None:
+        response = jsonify({'success': False, 'message': 'Too many live streams; poll /api/snapshot instead'})
+        response.headers['Retry-After'] = '60'
+        return response, 503
+
+    def generate():
+        last_version = excel_handler.version()
+        yield 'retry: 3000\n' + sse({'type': 'hello', 'version': last_version})
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                event = q.get(timeout=SSE_POLL_SECONDS)
+            except queue.Empty:
+                version = excel_handler.version()
+                if version != last_version:
+                    last_version = version
+                    yield sse({'type': 'resync', 'version': version})
+                else:
+                    yield ': keepalive\n\n'
+                continue
+            if event['type'] == 'resync' and event['version'] == last_version:
+                continue  # this stream already announced that change
+            if event['type'] == 'flushed':
+                last_version = event['version']  # buffered writes already sent as events
+                continue
+            last_version = event['version']
+            yield sse(event)
+
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs even if the client disconnects before the generator starts
+    response.call_on_close(lambda: excel_handler.unsubscribe(q))
+    return response
 
-@app.route('/api/add-worker', methods=['POST'])
+@bp.route('/api/export/<sheet>.xlsx', methods=['GET'])
+def export_sheet(sheet):
+    if sheet not in ('tasks', 'workers', 'archive'):
+        abort(404)
+    buf = io.BytesIO()
+    excel_handler.export_xlsx(sheet, buf)
+    buf.seek(0)
+    return send_file(buf, as_attachment=True, download_name=f'{sheet}.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+@bp.route('/api/add-worker', methods=['POST'])
 def add_worker():
     d = request.json
     excel_handler.add_worker(d['name'], d['job_title'], d['date_working'])
     return jsonify({'success': True})
 
-@app.route('/api/add-task', methods=['POST'])
+@bp.route('/api/add-task', methods=['POST'])
 def add_task():
     d = request.json
-    excel_handler.add_task(d['urgency'], d['description'])
-    return jsonify({'success': True})
+    task_id = excel_handler.add_task(d['urgency'], d['description'])
+    return jsonify({'success': True, 'id': task_id})
 
-@app.route('/api/complete-task', methods=['POST'])
+@bp.route('/api/complete-task', methods=['POST'])
 def complete_task():
-    excel_handler.update_task_completion(request.json['row_number'])
+    try:
+        excel_handler.update_task_completion(request.json['task_id'])
+    except KeyError:
+        return jsonify({'success': False, 'message': 'Task not found'}), 404
     return jsonify({'success': True})
 
-@app.route('/api/delete-task/<int:row>', methods=['DELETE'])
-def delete_task(row):
-    excel_handler.delete_task(row)
+@bp.route('/api/delete-task/<int:task_id>', methods=['DELETE'])
+def delete_task(task_id):
+    try:
+        excel_handler.delete_task(task_id)
+    except KeyError:
+        return jsonify({'success': False, 'message': 'Task not found'}), 404
     return jsonify({'success': True})
 
-@app.route('/api/delete-worker/<name>', methods=['DELETE'])
+# Bulk endpoints take a JSON array (bare or under the key below) or a CSV/XLSX upload
+# in the `file` form field, and apply every item in one batched write.
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', 5000))
+BULK_ACTIONS = {
+    'add-tasks': ('tasks', 'add_tasks'),
+    'add-workers': ('workers', 'add_workers'),
+    'complete-tasks': ('task_ids', 'complete_tasks'),
+    'delete-tasks': ('task_ids', 'delete_tasks'),
+}
+# Normalised upload column headings that differ from the item field names
+UPLOAD_FIELDS = {'task_description': 'description', 'id': 'task_id'}
+
+def upload_items(upload):
+    """Rows of an uploaded CSV/XLSX file as dicts keyed by its (normalised) header row."""
+    name = (upload.filename or '').lower()
+    if name.endswith('.csv'):
+        rows = csv.reader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+    elif name.endswith('.xlsx'):
+        rows = load_workbook(io.BytesIO(upload.read()), read_only=True).active.iter_rows(values_only=True)
+    else:
+        raise ValueError('upload must be a .csv or .xlsx file')
+    keys = [str(h or '').strip().lower().replace(' ', '_') for h in next(rows, None) or []]
+    keys = [UPLOAD_FIELDS.get(k, k) for k in keys]
+    return [dict(zip(keys, r)) for r in rows if any(v not in (None, '') for v in r)]
+
+@bp.route('/api/bulk/<action>', methods=['POST'])
+def bulk(action):
+    if action not in BULK_ACTIONS:
+        abort(404)
+    key, method = BULK_ACTIONS[action]
+    try:
+        if 'file' in request.files:
+            items = upload_items(request.files['file'])
+        else:
+            body = request.get_json(silent=True)
+            items = body.get(key) if isinstance(body, dict) else body
+    except Exception as e:  # malformed CSV/XLSX
+        return jsonify({'success': False, 'message': f'Could not read upload: {e}'}), 400
+    if not isinstance(items, list):
+        return jsonify({'success': False, 'message': f'Expected a JSON array, {{"{key}": [...]}} or a file upload'}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({'success': False, 'message': f'At most {BULK_MAX_ITEMS} items per request'}), 413
+    if key == 'task_ids':
+        items = [i.get('task_id') if isinstance(i, dict) else i for i in items]
+    results = getattr(excel_handler, method)(items)
+    failed = sum(not r['success'] for r in results)
+    return jsonify({'success': True, 'succeeded': len(results) - failed, 'failed': failed, 'results': results})
+
+@bp.route('/api/archive', methods=['GET'])
+def get_archive():
+    return conditional_json(excel_handler.version('archive'), excel_handler.read_archive)
+
+@bp.route('/api/archive', methods=['POST'])
+def archive_tasks():
+    days = (request.get_json(silent=True) or {}).get('days', excel_handler.archive_after_days or 30)
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'days must be a number'}), 400
+    if days < 0:
+        return jsonify({'success': False, 'message': 'days must not be negative'}), 400
+    ids = excel_handler.archive_completed(days)
+    return jsonify({'success': True, 'archived': len(ids)})
+
+@bp.route('/api/delete-worker/<name>', methods=['DELETE'])
 def delete_worker(name):
     excel_handler.delete_worker(name)
     return jsonify({'success': True})
 
-@app.route('/api/assign-tasks', methods=['POST'])
-def assign_bulk():
+@bp.route('/api/ai-cache', methods=['GET'])
+def ai_cache_stats():
+    return jsonify(ai_engine.cache_stats())
+
+def run_bulk_assignment(job):
+    job.update(stage='reading')
     workers = excel_handler.read_workers()
     tasks = excel_handler.read_tasks()
+    job.update(stage='matching')
     assignments = ai_engine.assign_tasks_one_per_person(workers, tasks)
-    for name, rows in assignments.items():
-        if rows: 
-            excel_handler.assign_task_to_worker(rows[0], name)
-    return jsonify({'success': True})
+    job.update(stage='saving', total=len(assignments))
+    # Re-check against the current sheet: tasks may have been taken while the model was thinking
+    open_ids = {t['id'] for t in excel_handler.read_tasks() if not t['assigned_to'] and not t['date_completed']}
+    assigned = 0
+    with excel_handler.batch():
+        for name, task_ids in assignments.items():
+            if task_ids and task_ids[0] in open_ids:
+                open_ids.discard(task_ids[0])
+                excel_handler.assign_task_to_worker(task_ids[0], name)
+                assigned += 1
+    job.update(stage='done')
+    return {'assigned': assigned}
+
+@bp.route('/api/assign-tasks', methods=['POST'])
+def assign_bulk():
+    # Identical concurrent requests share one job instead of starting a second run
+    try:
+        job = jobs.submit('assign-tasks', run_bulk_assignment)
+    except QueueFull:
+        return jsonify({'success': False, 'message': 'Assignment queue is full, try again shortly'}), 503
+    return jsonify({'success': True, 'job_id': job['id'], 'status': job['status']}), 202
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify(job)
+
+# Longest a request thread waits on the model before answering from the local matcher
+ASSIGN_SELF_WAIT = float(os.getenv('AI_ASSIGN_SELF_WAIT', 5))
 
-@app.route('/api/assign-self', methods=['POST'])
+@bp.route('/api/assign-self', methods=['POST'])
 def assign_self():
     worker_name = request.json.get('worker_name')
     workers = excel_handler.read_workers()
@@ -77,15 +363,21 @@ def assign_self():
 
     available_tasks = [t for t in tasks if not t['assigned_to'] and not t['date_completed']]
     
-    # AI determines if the worker is qualified for any available tasks
-    assignment = ai_engine.get_single_qualified_assignment(worker, available_tasks)
+    # AI determines if the worker is qualified for any available tasks; the call runs on the
+    # engine's pool so a slow model can't hold this thread past ASSIGN_SELF_WAIT
+    future = ai_engine.get_single_qualified_assignment_async(worker, available_tasks)
+    try:
+        assignment = future.result(timeout=ASSIGN_SELF_WAIT)
+    except FutureTimeout:
+        task = ai_engine.matcher.best_task(worker, available_tasks)
+        assignment = {'id': task['id']} if task else None
     
-    if assignment and assignment.get('row_number'):
-        excel_handler.assign_task_to_worker(assignment['row_number'], worker_name)
+    if assignment and assignment.get('id') in {t['id'] for t in available_tasks}:
+        excel_handler.assign_task_to_worker(assignment['id'], worker_name)
         return jsonify({'success': True})
     
     return jsonify({'success': False, 'message': 'No qualified tasks found for this role'})
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
@@ -0,0 +1,103 @@
+"""Microbenchmarks for each ExcelHandler method against a synthetic data set.
+
+    python bench/bench_handler.py --tasks 5000 --backend xlsx
+    python bench/bench_handler.py --tasks 5000 --save baseline.json
+    python bench/bench_handler.py --tasks 5000 --baseline baseline.json   # exits 1 on regression
+
+Runs against a throwaway copy of the generated data (DATA_DIR), never data/.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import generate
+import stats
+
+
+def cases(handler):
+    """(name, fn(i)) pairs; mutating cases draw on disjoint slices of the open tasks."""
+    workers = handler.read_workers()
+    open_ids = [t['id'] for t in handler.read_tasks() if not t['date_completed']]
+    third = max(1, len(open_ids) // 3)
+    complete_ids, assign_ids, delete_ids = open_ids[:third], open_ids[third:2 * third], open_ids[2 * third:]
+    name = workers[0]['name'] if workers else 'Bench Worker'
+
+    def cold_read(i):
+        handler._cache.clear()
+        handler.read_tasks()
+
+    return [
+        ('read_tasks (cold)', cold_read),
+        ('read_tasks', lambda i: handler.read_tasks()),
+        ('read_workers', lambda i: handler.read_workers()),
+        ('iter_tasks', lambda i: sum(1 for _ in handler.iter_tasks())),
+        ('query_tasks open limit=50', lambda i: handler.query_tasks('open', limit=50)),
+        ('read_worker_tasks', lambda i: handler.read_worker_tasks(workers[i % len(workers)]['name'] if workers else name)),
+        ('version', lambda i: handler.version()),
+        ('snapshot', lambda i: handler.snapshot()),
+        ('add_task', lambda i: handler.add_task(3, f'Bench task {i}')),
+        ('assign_task_to_worker', lambda i: handler.assign_task_to_worker(assign_ids[i % len(assign_ids)], name)),
+        ('update_task_completion', lambda i: handler.update_task_completion(complete_ids[i % len(complete_ids)])),
+        ('delete_task', lambda i: handler.delete_task(delete_ids.pop())),
+        ('add_worker', lambda i: handler.add_worker(f'Bench Worker {i}', 'Machinist', '0800-1600')),
+        ('delete_worker', lambda i: handler.delete_worker(f'Bench Worker {i}')),
+        ('add_tasks x100', lambda i: handler.add_tasks([{'urgency': 2, 'description': f'Bulk {i}-{n}'} for n in range(100)])),
+    ]
+
+
+def run(handler, iterations, budget):
+    """Each case runs `iterations` times or until `budget` seconds pass (at least 3 samples)."""
+    results = {}
+    for name, fn in cases(handler):
+        latencies, errors, spent = [], 0, 0.0
+        for i in range(iterations):
+            start = time.perf_counter()
+            try:
+                fn(i)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            spent += latencies[-1]
+            if spent > budget and i >= 2:
+                break
+        results[name] = stats.summarize(latencies, errors=errors)
+    handler.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--backend', choices=('xlsx', 'sqlite'), default='xlsx')
+    parser.add_argument('--write-behind', type=float, default=0, help='WRITE_BEHIND_SECS for the handler')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--budget', type=float, default=5, help='max seconds per case')
+    parser.add_argument('--save', help='write results as JSON (e.g. a baseline)')
+    parser.add_argument('--baseline', help='compare against a saved run and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, args.workers, args.tasks)
+        os.environ['DATA_DIR'] = directory
+        from excel_handler import ExcelHandler
+        handler = ExcelHandler(backend=args.backend, write_behind=args.write_behind)
+        results = run(handler, args.iterations, args.budget)
+
+    stats.print_table(results, f'ExcelHandler, {args.backend}, {args.workers} workers / {args.tasks} tasks')
+    if args.save:
+        stats.save(results, args.save)
+    if args.baseline:
+        found = stats.regressions(results, args.baseline, args.tolerance)
+        for line in found:
+            print('REGRESSION', line)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Full-mode vs streaming (read-only) parsing of a large tasks workbook.
+
+    python bench/bench_parse.py --rows 50000
+
+Reports time to first row, total parse time and peak Python heap (tracemalloc) for
+the old full-mode load_workbook path and for XlsxStorage.iter_rows.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import load_workbook
+from storage import XlsxStorage, ID_COLUMN, _task_row
+from datagen import generate
+
+
+def full_mode(path):
+    """The pre-streaming read path: every cell object is built before the first row."""
+    ws = load_workbook(path).active
+    for r in ws.iter_rows(min_row=2, values_only=True):
+        if r[1]:
+            yield _task_row(r[ID_COLUMN - 1], r)
+
+
+def timed(rows):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in rows:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return count, first, time.perf_counter() - start
+
+
+def peak_heap(rows):
+    # Separate pass: tracing slows parsing several-fold and would skew the timings
+    tracemalloc.start()
+    for _ in rows:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        workers_file, tasks_file = generate(directory, workers=10, tasks=args.rows)
+        storage = XlsxStorage(workers_file, tasks_file)
+        print(f'{args.rows} rows, {os.path.getsize(tasks_file) / 1e6:.1f} MB on disk, best of {args.repeat}')
+        print(f"{'parser':<12}{'rows':>8}{'first row':>12}{'total':>10}{'peak heap':>12}")
+        for name, rows in (('full', lambda: full_mode(tasks_file)), ('streaming', lambda: storage.iter_rows('tasks'))):
+            count, first, total = min((timed(rows()) for _ in range(args.repeat)), key=lambda m: m[2])
+            peak = peak_heap(rows())
+            print(f'{name:<12}{count:>8}{first * 1000:>10.1f}ms{total:>9.2f}s{peak / 1e6:>10.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Cold-start cost of the web app, measured in fresh interpreters.
+
+    python bench/bench_startup.py --tasks 5000 --repeat 5
+
+Each run is a new process (as a gunicorn worker or autoscaled instance would be) and
+reports the median of: importing app, create_app() (services plus workbook warm-up),
+the first GET /api/tasks, and the first model call's client construction.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+app = app_module.create_app()
+t2 = time.perf_counter()
+app.test_client().get('/api/tasks')
+t3 = time.perf_counter()
+openai_loaded = 'openai' in sys.modules
+app_module.ai_engine.client
+t4 = time.perf_counter()
+print(json.dumps({'import app': t1 - t0, 'create_app': t2 - t1, 'first /api/tasks': t3 - t2,
+                  'AI client (first use)': t4 - t3, 'openai imported before first use': openai_loaded}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--backend', choices=('xlsx', 'sqlite'), default='xlsx')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, args.workers, args.tasks)
+        # A dummy key makes the probe construct (but never call) the real client
+        env = dict(os.environ, DATA_DIR=directory, TASK_STORAGE=args.backend, OPENAI_API_KEY='sk-bench', AI_CACHE_FILE='')
+        runs = [json.loads(subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, check=True,
+                                          capture_output=True, text=True).stdout.splitlines()[-1])
+                for _ in range(args.repeat)]
+
+    print(f'startup, {args.backend}, {args.workers} workers / {args.tasks} tasks, median of {args.repeat}')
+    for name in runs[0]:
+        values = [r[name] for r in runs]
+        if isinstance(values[0], bool):
+            print(f'{name:<36}{str(any(values)):>10}')
+        else:
+            print(f'{name:<36}{statistics.median(values) * 1000:>8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Synthetic workers.xlsx / tasks.xlsx in the app's on-disk format.
+
+    python bench/datagen.py /tmp/bench-data --workers 200 --tasks 20000
+
+Titles and descriptions mix taxonomy vocabulary with unrecognised ones, so both the
+local matcher and the model fallback get exercised. Output is deterministic per --seed.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+from openpyxl.packaging.custom import IntProperty
+from storage import TASK_HEADERS, WORKER_HEADERS, NEXT_ID_PROPERTY
+
+TITLES = ['Lead Machinist', 'CNC Operator', 'Maintenance Technician', 'Avionics Electrician',
+          'Certified Welder', 'Composite Layup Technician', 'Assembly Mechanic', 'Quality Inspector',
+          'Logistics Coordinator', 'Facilities Custodian', 'Programme Liaison', 'Test Pilot']
+ACTIONS = ['Inspect', 'Repair', 'Replace', 'Calibrate', 'Machine', 'Weld', 'Rewire', 'Deburr', 'Audit', 'Move']
+OBJECTS = ['lathe spindle', 'hydraulic pump', 'wing panel fasteners', 'wiring harness', 'titanium bracket',
+           'carbon fibre skin', 'fuselage frame', 'torque wrench set', 'pallet of rivets', 'hangar door seal',
+           'customer briefing pack', 'flight test card']
+SHIFTS = ['0600-1400', '0800-1600', '1400-2200', '2200-0600']
+NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+
+
+def generate(directory, workers=50, tasks=1000, completed=0.6, assigned=0.2, seed=1):
+    """Writes both workbooks into directory and returns their paths.
+
+    `completed` and `assigned` are the fractions of tasks that are done, and open but
+    already taken by someone.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    workers_file = os.path.join(directory, 'workers.xlsx')
+    tasks_file = os.path.join(directory, 'tasks.xlsx')
+
+    names = [f'{NAMES[i % len(NAMES)]} {i:04d}' for i in range(workers)]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(WORKER_HEADERS)
+    for name in names:
+        ws.append([name, rng.choice(TITLES), rng.choice(SHIFTS)])
+    wb.save(workers_file)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(TASK_HEADERS)
+    for task_id in range(1, tasks + 1):
+        day = rng.randint(1, 28)
+        date_assigned = f'{rng.randint(1, 12):02d}/{day:02d}/2024'
+        roll = rng.random()
+        date_completed = f'{date_assigned} {rng.randint(1, 12):02d}:{rng.randint(0, 59):02d} PM' if roll < completed else None
+        assignee = rng.choice(names) if names and roll < completed + assigned else None
+        ws.append([rng.randint(1, 5), f'{rng.choice(ACTIONS)} {rng.choice(OBJECTS)} #{task_id}',
+                   date_assigned, date_completed, assignee, task_id])
+    # Without this, new tasks would restart at id 1
+    wb.custom_doc_props.append(IntProperty(name=NEXT_ID_PROPERTY, value=tasks + 1))
+    wb.save(tasks_file)
+    return workers_file, tasks_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory')
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--completed', type=float, default=0.6)
+    parser.add_argument('--assigned', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    for path in generate(args.directory, args.workers, args.tasks, args.completed, args.assigned, args.seed):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
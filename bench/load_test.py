@@ -0,0 +1,192 @@
+"""Concurrent HTTP load against the Flask app with a stubbed model.
+
+    python bench/load_test.py --tasks 5000 --clients 16 --duration 30
+    python bench/load_test.py --baseline load.json   # exits 1 on regression
+    python bench/load_test.py --url http://127.0.0.1:8000   # an already running server
+
+By default the app is served in-process (threaded werkzeug) over generated data in a
+temp DATA_DIR, and AIEngine's client is replaced by a stub that answers after
+--ai-latency seconds, so runs are repeatable and cost nothing.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import generate
+import stats
+
+# (scenario, weight)
+MIX = [('GET /api/tasks', 35), ('GET /api/tasks?status=open', 10), ('GET /api/snapshot', 20),
+       ('POST /api/assign-self', 10), ('POST /api/complete-task', 10), ('POST /api/add-task', 10),
+       ('POST /api/assign-tasks', 5)]
+
+
+class StubCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def create(self, messages, **kwargs):
+        time.sleep(self.latency)
+        single = 'single best-qualified task' in messages[0]['content']
+        content = '{"id": null}' if single else '{}'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class StubClient:
+    """Stands in for the OpenAI client: same call shape, fixed latency, no network."""
+
+    def __init__(self, latency):
+        self.chat = SimpleNamespace(completions=StubCompletions(latency))
+
+
+class Client:
+    def __init__(self, base_url, rng):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.rng = rng
+        self.etag = None
+
+    def request(self, method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            payload = json.dumps(body).encode() if body is not None else None
+            conn.request(method, path, body=payload, headers=dict(headers or {}, **({'Content-Type': 'application/json'} if payload else {})))
+            response = conn.getresponse()
+            data = response.read()
+            return response.status, response.getheader('ETag'), json.loads(data) if data else None
+        finally:
+            conn.close()
+
+    def run(self, scenario, workers, open_ids):
+        """Performs one scenario; returns True on an expected status."""
+        if scenario == 'GET /api/tasks':
+            # Pollers revalidate with the ETag they already hold
+            status, etag, _ = self.request('GET', '/api/tasks', headers={'If-None-Match': self.etag} if self.etag else None)
+            self.etag = etag or self.etag
+            return status in (200, 304)
+        if scenario == 'GET /api/tasks?status=open':
+            return self.request('GET', '/api/tasks?status=open&limit=50')[0] == 200
+        if scenario == 'GET /api/snapshot':
+            return self.request('GET', '/api/snapshot')[0] == 200
+        if scenario == 'POST /api/assign-self':
+            return self.request('POST', '/api/assign-self', {'worker_name': self.rng.choice(workers)})[0] == 200
+        if scenario == 'POST /api/complete-task':
+            return self.request('POST', '/api/complete-task', {'task_id': self.rng.choice(open_ids)})[0] in (200, 404)
+        if scenario == 'POST /api/add-task':
+            return self.request('POST', '/api/add-task', {'urgency': self.rng.randint(1, 5), 'description': 'Load test: inspect panel'})[0] == 200
+        if scenario == 'POST /api/assign-tasks':
+            status, _, job = self.request('POST', '/api/assign-tasks')
+            if status != 202:
+                return status == 503  # queue full is back-pressure, not a failure
+            job_id = job['job_id']
+            while job.get('status') in ('queued', 'running'):
+                time.sleep(0.05)
+                job = self.request('GET', f'/api/jobs/{job_id}')[2]
+            return job.get('status') == 'done'
+        raise ValueError(scenario)
+
+
+def serve_in_process(args, directory):
+    generate(directory, args.workers, args.tasks)
+    os.environ.update(DATA_DIR=directory, OPENAI_API_KEY='', AI_CACHE_FILE='', TASK_STORAGE=args.backend,
+                      WRITE_BEHIND_SECS=str(args.write_behind))
+    from werkzeug.serving import make_server
+    start = time.perf_counter()
+    import app as app_module
+    imported = time.perf_counter()
+    app = app_module.create_app()
+    print(f'startup: import {(imported - start) * 1000:.0f}ms, create_app {(time.perf_counter() - imported) * 1000:.0f}ms')
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    app_module.ai_engine.client = StubClient(args.ai_latency)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def drive(base_url, clients, duration, seed):
+    setup = Client(base_url, random.Random(seed))
+    workers = [w['name'] for w in setup.request('GET', '/api/workers')[2]]
+    open_ids = [t['id'] for t in setup.request('GET', '/api/tasks?status=open')[2]] or [1]
+    names, weights = zip(*MIX)
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def loop(n):
+        client = Client(base_url, random.Random(seed + n))
+        while time.perf_counter() < stop_at:
+            scenario = client.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = client.run(scenario, workers, open_ids)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[scenario].append(elapsed)
+                errors[scenario] += not ok
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=loop, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    results = {name: stats.summarize(samples[name], wall, errors[name]) for name in names}
+    results['all'] = stats.summarize([s for name in names for s in samples[name]], wall, sum(errors.values()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='target a running server instead of an in-process one')
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--backend', choices=('xlsx', 'sqlite'), default='xlsx')
+    parser.add_argument('--write-behind', type=float, default=0)
+    parser.add_argument('--ai-latency', type=float, default=0.5, help='stub model latency in seconds')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='write results as JSON (e.g. a baseline)')
+    parser.add_argument('--baseline', help='compare against a saved run and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        base_url = args.url
+        if not base_url:
+            server, base_url = serve_in_process(args, directory)
+        try:
+            results = drive(base_url, args.clients, args.duration, args.seed)
+        finally:
+            if server:
+                server.shutdown()
+
+    target = args.url or f'in-process {args.backend}, {args.workers} workers / {args.tasks} tasks, stub model {args.ai_latency}s'
+    stats.print_table(results, f'{args.clients} clients for {args.duration:.0f}s against {target}')
+    if args.save:
+        stats.save(results, args.save)
+    if args.baseline:
+        found = stats.regressions(results, args.baseline, args.tolerance)
+        for line in found:
+            print('REGRESSION', line)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Latency summaries, result tables and baseline comparison shared by the benchmarks."""
+import json
+import math
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, elapsed=None, errors=0):
+    """latencies in seconds -> {count, errors, p50_ms, p99_ms, max_ms, per_sec}.
+
+    per_sec is count/elapsed when the samples ran concurrently over `elapsed` seconds,
+    otherwise the single-threaded rate implied by their total.
+    """
+    ordered = sorted(latencies)
+    total = elapsed if elapsed is not None else sum(ordered)
+    return {
+        'count': len(ordered),
+        'errors': errors,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round((ordered[-1] if ordered else 0) * 1000, 3),
+        'per_sec': round(len(ordered) / total, 1) if total else 0.0,
+    }
+
+
+def print_table(results, title=None):
+    if title:
+        print(title)
+    width = max([len(name) for name in results] + [10])
+    print(f"{'name':<{width}}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'per sec':>10}")
+    for name, r in results.items():
+        print(f"{name:<{width}}{r['count']:>8}{r['errors']:>8}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['max_ms']:>10.2f}{r['per_sec']:>10.1f}")
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def regressions(results, baseline_path, tolerance=0.25, floor_ms=1.0):
+    """Names whose p99 grew (or throughput fell) by more than `tolerance` against a saved run.
+
+    Timings under floor_ms are ignored; they are dominated by noise.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    found = []
+    for name, r in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if r['p99_ms'] > max(old['p99_ms'], floor_ms) * (1 + tolerance):
+            found.append(f"{name}: p99 {old['p99_ms']:.2f}ms -> {r['p99_ms']:.2f}ms")
+        if old['per_sec'] and r['per_sec'] < old['per_sec'] * (1 - tolerance):
+            found.append(f"{name}: throughput {old['per_sec']:.1f}/s -> {r['per_sec']:.1f}/s")
+    return found
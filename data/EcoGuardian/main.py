@@ -1,16 +1,24 @@
 import os
 import time
+import asyncio
 import json
 import random
 import threading
 import urllib.request
+import httpx
+from collections import OrderedDict
 from queue import Queue, Empty
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from concurrent.futures import ThreadPoolExecutor
+from openai import AzureOpenAI, AsyncAzureOpenAI, DefaultAsyncHttpxClient
+from concurrent.futures import Future, ThreadPoolExecutor
 from azure.eventhub import EventHubConsumerClient
 from cloud.iot_hub_client import send_to_iot_hub
 
+try:
+    import numpy as np
+except ImportError:     # only needed for ECOGUARDIAN_ENGINE=numpy (section 22)
+    np = None
+
 # ---------------------------------------------------------------------------
 # 1. Setup
 # ---------------------------------------------------------------------------
@@ -25,6 +33,17 @@ NTFY_TOPIC        = os.getenv("NTFY_TOPIC")
 EVENTHUB_CONN_STR = os.getenv("IOTHUB_EVENT_HUB_ENDPOINT")
 EVENTHUB_NAME     = os.getenv("IOTHUB_EVENT_HUB_NAME")
 
+# "threads" runs one thread per room; "async" runs every room on one event
+# loop (section 21) with at most MAX_CONCURRENCY outbound calls in flight.
+RUNTIME         = os.getenv("ECOGUARDIAN_RUNTIME", "threads").lower()
+VIRTUAL_ROOMS   = int(os.getenv("ECOGUARDIAN_VIRTUAL_ROOMS", "0"))
+MAX_CONCURRENCY = int(os.getenv("ECOGUARDIAN_MAX_CONCURRENCY", "64"))
+TICK_SECS       = 6
+
+# "numpy" steps every room of Mode B/C in one vectorized call (section 22)
+ENGINE          = os.getenv("ECOGUARDIAN_ENGINE", "rooms").lower()
+SEED            = os.getenv("ECOGUARDIAN_SEED")
+
 client = AzureOpenAI(
     api_version=API_VERSION,
     azure_endpoint=ENDPOINT,
@@ -37,6 +56,15 @@ ROOMS = [
     {"dtId": "ecoguardian-dt-lab-c-412", "roomId": "Lab-C-412"}
 ]
 
+LAB_ROOM_IDS = {room["roomId"] for room in ROOMS}
+
+# Extra simulated rooms for load tests, e.g. ECOGUARDIAN_VIRTUAL_ROOMS=2000.
+# They are not printed one by one; see print_virtual_summary.
+ROOMS += [
+    {"dtId": f"ecoguardian-dt-sim-{n:05d}", "roomId": f"Sim-{n:05d}"}
+    for n in range(1, VIRTUAL_ROOMS + 1)
+]
+
 ROOM_DISPLAY = {
     "Lab-A-205": "LAB A  (205)",
     "Lab-B-301": "LAB B  (301)",
@@ -203,6 +231,8 @@ METRIC_LABELS = {
 _alerted_rooms      = {}
 _alerted_rooms_lock = threading.Lock()
 _print_counter      = {room["roomId"]: 0 for room in ROOMS}
+_virtual_risk       = {}    # riskLevel -> virtual-room ticks since the last summary
+_virtual_risk_lock  = threading.Lock()
 
 
 # ---------------------------------------------------------------------------
@@ -273,6 +303,9 @@ def print_lab_block(room_id, risk_level, co2, temp, humidity, pm25,
 # ---------------------------------------------------------------------------
 # 8. Local risk classifier
 # ---------------------------------------------------------------------------
+RISK_LEVELS = ["Low", "Medium", "High", "Critical"]
+
+
 def _local_risk(co2, temp, humidity, pm25):
     def co2_risk(v):
         if v >= THRESHOLDS["co2"]["critical"]: return 3
@@ -301,7 +334,7 @@ def _local_risk(co2, temp, humidity, pm25):
         return 0
 
     level = max(co2_risk(co2), temp_risk(temp), hum_risk(humidity), pm_risk(pm25))
-    return ["Low", "Medium", "High", "Critical"][level]
+    return RISK_LEVELS[level]
 
 
 # ---------------------------------------------------------------------------
@@ -367,14 +400,15 @@ def esp32_listener():
 # ---------------------------------------------------------------------------
 # 10. Push notification (silent)
 # ---------------------------------------------------------------------------
-def send_push_alert(room_id, risk_level, possible_causes, possible_solutions):
+def _alert_request(room_id, risk_level, possible_causes, possible_solutions):
+    """(url, body, headers) for an ntfy alert, or None when disabled or cooling down."""
     if not NTFY_TOPIC:
-        return
+        return None
     now = time.time()
     with _alerted_rooms_lock:
         last = _alerted_rooms.get(room_id, 0)
         if now - last < ALERT_COOLDOWN_SECS:
-            return
+            return None
         _alerted_rooms[room_id] = now
 
     def clean(text):
@@ -388,17 +422,21 @@ def send_push_alert(room_id, risk_level, possible_causes, possible_solutions):
         f"Solution: {clean(possible_solutions)}"
     ).encode("utf-8")
 
+    headers = {
+        "Title":    f"EcoGuardian ALERT - {room_id} {risk_level}".encode("utf-8"),
+        "Priority": "urgent" if risk_level == "Critical" else "high",
+        "Tags":     "warning,lab",
+    }
+    return f"https://ntfy.sh/{NTFY_TOPIC}", body, headers
+
+
+def send_push_alert(room_id, risk_level, possible_causes, possible_solutions):
+    request = _alert_request(room_id, risk_level, possible_causes, possible_solutions)
+    if request is None:
+        return
+    url, body, headers = request
     try:
-        req = urllib.request.Request(
-            f"https://ntfy.sh/{NTFY_TOPIC}",
-            data=body,
-            headers={
-                "Title":    f"EcoGuardian ALERT - {room_id} {risk_level}".encode("utf-8"),
-                "Priority": "urgent" if risk_level == "Critical" else "high",
-                "Tags":     "warning,lab",
-            },
-            method="POST"
-        )
+        req = urllib.request.Request(url, data=body, headers=headers, method="POST")
         with urllib.request.urlopen(req, timeout=10):
             pass
     except Exception:
@@ -599,6 +637,32 @@ def next_mode_b():
 # ---------------------------------------------------------------------------
 # 17. Mode C — starts High/Critical, interactive remediation
 # ---------------------------------------------------------------------------
+def _apply_answer(room_id, state, answer, print_lock):
+    """Applies a y/n answer to a Mode C prompt; only real rooms announce it."""
+    state["prompt_pending"]     = False
+    state["cooldown_remaining"] = PROMPT_COOLDOWN
+    announce = room_id in LAB_ROOM_IDS
+    if answer == "y":
+        state["remediating"]     = True
+        state["ai_action_taken"] = "Yes"
+        if announce:
+            with print_lock:
+                lc = LAB_COLOR.get(room_id, RESET)
+                print(f"\n  {lc}✅ {ROOM_DISPLAY.get(room_id, room_id)} — remediation started.{RESET}")
+    else:
+        # NO — lock all drifts in worsening direction permanently
+        state["ai_action_taken"] = "No"
+        state["co2_drift"]  =  1;  state["co2_ttl"]  = 9999
+        state["temp_drift"] =  1;  state["temp_ttl"] = 9999
+        state["hum_drift"]  = -1;  state["hum_ttl"]  = 9999
+        state["pm_drift"]   =  1;  state["pm_ttl"]   = 9999
+        if announce:
+            with print_lock:
+                lc = LAB_COLOR.get(room_id, RESET)
+                print(f"\n  {lc}❌ {ROOM_DISPLAY.get(room_id, room_id)} — action declined. "
+                      f"Conditions will worsen and will NOT recover.{RESET}")
+
+
 def next_mode_c(room_id, print_lock):
     state = ROOM_STATE[room_id]
 
@@ -607,25 +671,7 @@ def next_mode_c(room_id, print_lock):
         with response_lock:
             answer = response_store.pop(room_id, None)
         if answer is not None:
-            state["prompt_pending"]     = False
-            state["cooldown_remaining"] = PROMPT_COOLDOWN
-            if answer == "y":
-                state["remediating"]     = True
-                state["ai_action_taken"] = "Yes"
-                with print_lock:
-                    lc = LAB_COLOR.get(room_id, RESET)
-                    print(f"\n  {lc}✅ {ROOM_DISPLAY.get(room_id, room_id)} — remediation started.{RESET}")
-            else:
-                # NO — lock all drifts in worsening direction permanently
-                state["ai_action_taken"] = "No"
-                state["co2_drift"]  =  1;  state["co2_ttl"]  = 9999
-                state["temp_drift"] =  1;  state["temp_ttl"] = 9999
-                state["hum_drift"]  = -1;  state["hum_ttl"]  = 9999
-                state["pm_drift"]   =  1;  state["pm_ttl"]   = 9999
-                with print_lock:
-                    lc = LAB_COLOR.get(room_id, RESET)
-                    print(f"\n  {lc}❌ {ROOM_DISPLAY.get(room_id, room_id)} — action declined. "
-                          f"Conditions will worsen and will NOT recover.{RESET}")
+            _apply_answer(room_id, state, answer, print_lock)
         else:
             # Still waiting — keep drifting (or worsening if already declined)
             if state["ai_action_taken"] == "No":
@@ -649,9 +695,10 @@ def next_mode_c(room_id, print_lock):
         humidity = _step_remediate(state, "humidity")
         pm25     = _step_remediate(state, "pm25")
         if _all_safe(state):
-            with print_lock:
-                lc = LAB_COLOR.get(room_id, RESET)
-                print(f"\n  {lc}✅ REMEDIATION COMPLETE — {ROOM_DISPLAY.get(room_id, room_id)}{RESET}")
+            if room_id in LAB_ROOM_IDS:
+                with print_lock:
+                    lc = LAB_COLOR.get(room_id, RESET)
+                    print(f"\n  {lc}✅ REMEDIATION COMPLETE — {ROOM_DISPLAY.get(room_id, room_id)}{RESET}")
             state["remediating"]        = False
             state["remediation_action"] = None
             state["ai_action_taken"]    = "NULL"
@@ -684,7 +731,12 @@ def next_mode_c(room_id, print_lock):
             worst  = METRIC_LABELS[_worst_metric(state)]
             state["remediation_action"] = action
             state["prompt_pending"]     = True
-            prompt_queue.put((room_id, worst, risk, action))
+            if room_id in LAB_ROOM_IDS:
+                prompt_queue.put((room_id, worst, risk, action))
+            else:
+                # Nobody answers for virtual rooms: decide on the spot, as the vector engine does
+                answer = "y" if random.random() < VECTOR_ACCEPT_PROB else "n"
+                _apply_answer(room_id, state, answer, print_lock)
 
     return (
         int(state["co2"]),
@@ -697,130 +749,377 @@ def next_mode_c(room_id, print_lock):
 # ---------------------------------------------------------------------------
 # 18. AI analysis
 # ---------------------------------------------------------------------------
+def _threshold_bands(co2, temp, humidity, pm25):
+    """Which THRESHOLDS band each reading sits in; any change is a threshold crossing."""
+    readings = {"co2": co2, "temp": temp, "humidity": humidity, "pm25": pm25}
+    return tuple(
+        sum(readings[metric] >= limit for limit in THRESHOLDS[metric].values())
+        for metric in THRESHOLDS
+    )
+
+
+# Readings are rounded to these steps for the cache key, so near-identical
+# readings in the same threshold bands share one answer.
+CACHE_QUANTUM  = {"co2": 50, "temp": 0.5, "humidity": 2, "pm25": 2.0}
+CACHE_MAX_SIZE = 512
+CACHE_TTL_SECS = 600
+
+_analysis_cache      = OrderedDict()    # key -> (expires_at, ai_data), LRU order
+_analysis_cache_lock = threading.Lock()
+_cache_counters      = {"hits": 0, "misses": 0}
+
+
+def _cache_key(room_id, co2, temp, humidity, pm25):
+    readings  = {"co2": co2, "temp": temp, "humidity": humidity, "pm25": pm25}
+    quantized = tuple(round(readings[m] / CACHE_QUANTUM[m]) for m in CACHE_QUANTUM)
+    return room_id, _threshold_bands(co2, temp, humidity, pm25), quantized
+
+
+def cache_stats():
+    with _analysis_cache_lock:
+        hits, misses = _cache_counters["hits"], _cache_counters["misses"]
+        size = len(_analysis_cache)
+    lookups = hits + misses
+    return {
+        "hits":        hits,
+        "misses":      misses,
+        "saved_calls": hits,
+        "hit_ratio":   round(hits / lookups, 3) if lookups else 0.0,
+        "size":        size,
+    }
+
+
+def _cache_lookup(key, now):
+    with _analysis_cache_lock:
+        entry = _analysis_cache.get(key)
+        if entry is not None and entry[0] > now:
+            _analysis_cache.move_to_end(key)
+            _cache_counters["hits"] += 1
+            return dict(entry[1])
+        _analysis_cache.pop(key, None)
+        _cache_counters["misses"] += 1
+    return None
+
+
+def _cache_store(key, now, ai_data):
+    if ai_data.get("riskLevel") == "Unknown":   # never cache API errors
+        return
+    with _analysis_cache_lock:
+        _analysis_cache[key] = (now + CACHE_TTL_SECS, ai_data)
+        _analysis_cache.move_to_end(key)
+        while len(_analysis_cache) > CACHE_MAX_SIZE:
+            _analysis_cache.popitem(last=False)
+
+
 def get_thorough_ai_analysis(room_id, co2, temp, humidity, pm25):
-    user_msg = (
+    key = _cache_key(room_id, co2, temp, humidity, pm25)
+    now = time.time()
+    cached = _cache_lookup(key, now)
+    if cached is not None:
+        return cached
+
+    ai_data = _ai_analysis_uncached(room_id, co2, temp, humidity, pm25)
+    _cache_store(key, now, ai_data)
+    return dict(ai_data)
+
+
+AI_ERROR_RESULT = {
+    "riskLevel":       "Unknown",
+    "causes":          "API error — check connection",
+    "solutions":       "Verify Azure OpenAI credentials",
+    "recommendations": "N/A"
+}
+
+
+def _ai_analysis_uncached(room_id, co2, temp, humidity, pm25):
+    return _submit_to_batch(room_id, (co2, temp, humidity, pm25)).result()
+
+
+# ---------------------------------------------------------------------------
+# 18a. AI request batching
+# ---------------------------------------------------------------------------
+# Rooms that need an analysis in the same tick share one completion: the
+# batcher waits up to BATCH_WINDOW_SECS (or until every room has asked),
+# sends all readings together and hands each room its own entry back.
+BATCH_WINDOW_SECS = 0.5
+BATCH_MAX_ROOMS   = 20
+
+AI_BATCH_PROMPT = (
+    AI_SYSTEM_PROMPT + "\n\n"
+    "You will receive readings for one or more rooms, one room per line. "
+    "Assess each room independently and return ONLY valid JSON:\n"
+    '{"assessments": [{"roomId": "<room id as given>", "riskLevel": ..., '
+    '"causes": ..., "solutions": ..., "recommendations": ...}]}\n'
+    "with exactly one entry per room."
+)
+
+_batch_pending  = []                    # (room_id, readings, Future)
+_batch_ready    = threading.Condition()
+_batch_thread   = None
+_batch_counters = {"calls": 0, "rooms": 0}
+
+
+def _submit_to_batch(room_id, readings):
+    global _batch_thread
+    future = Future()
+    with _batch_ready:
+        if _batch_thread is None:
+            _batch_thread = threading.Thread(target=_batch_worker, daemon=True)
+            _batch_thread.start()
+        _batch_pending.append((room_id, readings, future))
+        _batch_ready.notify()
+    return future
+
+
+def _batch_worker():
+    while True:
+        with _batch_ready:
+            while not _batch_pending:
+                _batch_ready.wait()
+            deadline = time.monotonic() + BATCH_WINDOW_SECS
+            while len(_batch_pending) < min(len(ROOMS), BATCH_MAX_ROOMS):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _batch_ready.wait(remaining)
+            batch = _batch_pending[:BATCH_MAX_ROOMS]
+            del _batch_pending[:BATCH_MAX_ROOMS]
+
+        results = _analyze_batch([(room_id, readings) for room_id, readings, _ in batch])
+        for (_, _, future), ai_data in zip(batch, results):
+            future.set_result(ai_data)
+
+
+def _batch_messages(requests):
+    user_msg = "\n".join(
         f"Room {room_id}: CO2={co2}ppm, Temp={temp}C, "
         f"Humidity={humidity}%, PM2.5={pm25}ug/m3."
+        for room_id, (co2, temp, humidity, pm25) in requests
     )
+    return [
+        {"role": "system", "content": AI_BATCH_PROMPT},
+        {"role": "user",   "content": user_msg}
+    ]
+
+
+def _batch_results(requests, content):
+    """Per-room results from a batch reply; rooms missing from it get AI_ERROR_RESULT."""
+    by_room = {}
+    try:
+        for entry in json.loads(content).get("assessments", []):
+            if isinstance(entry, dict) and "roomId" in entry:
+                by_room[str(entry.pop("roomId"))] = entry
+    except Exception:
+        pass
+    with _batch_ready:
+        _batch_counters["calls"] += 1
+        _batch_counters["rooms"] += len(requests)
+    return [dict(by_room.get(room_id) or AI_ERROR_RESULT) for room_id, _ in requests]
+
+
+def _analyze_batch(requests):
+    """One completion for several rooms."""
+    content = None
     try:
         response = client.chat.completions.create(
             model=DEPLOYMENT_NAME,
-            messages=[
-                {"role": "system", "content": AI_SYSTEM_PROMPT},
-                {"role": "user",   "content": user_msg}
-            ],
+            messages=_batch_messages(requests),
             temperature=0.2,
             response_format={"type": "json_object"}
         )
-        return json.loads(response.choices[0].message.content)
+        content = response.choices[0].message.content
     except Exception:
-        return {
-            "riskLevel":       "Unknown",
-            "causes":          "API error — check connection",
-            "solutions":       "Verify Azure OpenAI credentials",
-            "recommendations": "N/A"
-        }
+        pass
+    return _batch_results(requests, content)
+
+
+# ---------------------------------------------------------------------------
+# 18b. AI call gating
+# ---------------------------------------------------------------------------
+# Steady Low/Medium ticks reuse the last explanation instead of calling Azure.
+_last_analysis = {}     # room_id -> (local risk, threshold bands, ai_data)
+_ai_counters   = {"calls": 0, "reused": 0}
+_ai_lock       = threading.Lock()
+
+
+def _gate_lookup(room_id, co2, temp, humidity, pm25):
+    """(previous analysis or None, local risk, threshold bands)."""
+    risk  = _local_risk(co2, temp, humidity, pm25)
+    bands = _threshold_bands(co2, temp, humidity, pm25)
+    with _ai_lock:
+        last = _last_analysis.get(room_id)
+        if (last is not None
+                and risk not in ("High", "Critical")
+                and last[0] == risk
+                and last[1] == bands
+                and last[2].get("riskLevel") != "Unknown"):
+            _ai_counters["reused"] += 1
+            return last[2], risk, bands
+    return None, risk, bands
+
+
+def _gate_record(room_id, risk, bands, ai_data):
+    with _ai_lock:
+        _last_analysis[room_id] = (risk, bands, ai_data)
+        _ai_counters["calls"] += 1
+
+
+def get_gated_ai_analysis(room_id, co2, temp, humidity, pm25):
+    """
+    Calls the LLM only when the local risk level changes, a reading crosses a
+    threshold band, the room is High/Critical, or the last call failed.
+    Otherwise returns the room's previous analysis.
+    """
+    reused, risk, bands = _gate_lookup(room_id, co2, temp, humidity, pm25)
+    if reused is not None:
+        return reused
+
+    ai_data = get_thorough_ai_analysis(room_id, co2, temp, humidity, pm25)
+    _gate_record(room_id, risk, bands, ai_data)
+    return ai_data
 
 
 # ---------------------------------------------------------------------------
 # 19. Room simulation thread
 # ---------------------------------------------------------------------------
-def simulate_room(room_info, print_lock, mode):
+def _wait_for_esp32(room_id, print_lock):
+    """Lab-A-205: wait for first ESP32 reading before starting."""
+    with print_lock:
+        lc = LAB_COLOR.get(room_id, RESET)
+        print(f"  {lc}⏳ Waiting for ESP32 sensor — Lab-A-205...{RESET}")
+    got = esp32_ready_event.wait(timeout=30)
+    if got:
+        real_temp, is_real = get_esp32_temp()
+        if is_real:
+            ROOM_STATE[room_id]["temp"] = real_temp
+            with print_lock:
+                lc = LAB_COLOR.get(room_id, RESET)
+                print(f"  {lc}🌡️  Lab-A-205 sensor online — {real_temp}°C{RESET}")
+    else:
+        with print_lock:
+            print(f"  ⚠️  ESP32 timeout — Lab-A-205 using simulated temperature")
+
+
+def _needs_esp32(room_id):
+    return room_id == "Lab-A-205" and EVENTHUB_CONN_STR and EVENTHUB_NAME
+
+
+def _next_reading(room_id, print_lock, mode):
+    """One tick's (co2, temp, humidity, pm25, temp_source) for a room."""
+    if mode == "a":
+        co2, temp, humidity, pm25 = next_mode_a(room_id)
+    elif mode == "c":
+        co2, temp, humidity, pm25 = next_mode_c(room_id, print_lock)
+    else:
+        co2, temp, humidity, pm25 = next_mode_b()
+
+    # Lab-A-205: always override temp with real ESP32 reading
+    temp_source = "simulated"
+    if room_id == "Lab-A-205":
+        real_temp, is_real = get_esp32_temp()
+        if is_real:
+            temp        = real_temp
+            temp_source = "real"
+            ROOM_STATE[room_id]["temp"] = real_temp
+    return co2, temp, humidity, pm25, temp_source
+
+
+def _report_tick(room_info, print_lock, mode, reading, ai_data):
+    """Builds the telemetry payload and prints the room's block when due."""
     dt_id   = room_info["dtId"]
     room_id = room_info["roomId"]
-    every   = PRINT_EVERY[mode]
+    co2, temp, humidity, pm25, temp_source = reading
+
+    state        = ROOM_STATE.get(room_id, {})
+    remediating  = state.get("remediating",     False)
+    action_taken = state.get("ai_action_taken", "NULL") if mode != "b" else "NULL"
+    cooldown     = state.get("cooldown_remaining", 0)
+
+    payload = {
+        "dtId":              dt_id,
+        "roomId":            room_id,
+        "co2":               co2,
+        "temperature":       temp,
+        "humidity":          humidity,
+        "pm2_5":             pm25,
+        "riskLevel":         ai_data.get("riskLevel"),
+        "possibleCauses":    ai_data.get("causes"),
+        "possibleSolutions": ai_data.get("solutions"),
+        "aiRecommendations": ai_data.get("recommendations"),
+        "remediating":       remediating,
+        "aiActionTaken":     action_taken,
+        "tempSource":        temp_source,
+    }
+
+    if room_id not in LAB_ROOM_IDS:
+        level = payload["riskLevel"] or "Unknown"
+        with _virtual_risk_lock:
+            _virtual_risk[level] = _virtual_risk.get(level, 0) + 1
+        return payload
+
+    _print_counter[room_id] += 1
+    # Always print on High/Critical, otherwise respect frequency
+    should_print = (
+        (_print_counter[room_id] % PRINT_EVERY[mode] == 0) or
+        payload["riskLevel"] in ("High", "Critical")
+    )
 
-    # Lab-A-205: wait for first ESP32 reading before starting
-    if room_id == "Lab-A-205" and EVENTHUB_CONN_STR and EVENTHUB_NAME:
+    if should_print:
         with print_lock:
-            lc = LAB_COLOR.get(room_id, RESET)
-            print(f"  {lc}⏳ Waiting for ESP32 sensor — Lab-A-205...{RESET}")
-        got = esp32_ready_event.wait(timeout=30)
-        if got:
-            real_temp, is_real = get_esp32_temp()
-            if is_real:
-                ROOM_STATE[room_id]["temp"] = real_temp
-                with print_lock:
-                    lc = LAB_COLOR.get(room_id, RESET)
-                    print(f"  {lc}🌡️  Lab-A-205 sensor online — {real_temp}°C{RESET}")
-        else:
-            with print_lock:
-                print(f"  ⚠️  ESP32 timeout — Lab-A-205 using simulated temperature")
+            print_lab_block(
+                room_id      = room_id,
+                risk_level   = ai_data.get("riskLevel", "Unknown"),
+                co2          = co2,
+                temp         = temp,
+                humidity     = humidity,
+                pm25         = pm25,
+                temp_source  = temp_source,
+                cause        = ai_data.get("causes", ""),
+                solution     = ai_data.get("solutions", ""),
+                remediating  = remediating,
+                action_taken = action_taken,
+                cooldown     = cooldown,
+                mode         = mode,
+            )
+    return payload
 
-    while True:
-        if mode == "a":
-            co2, temp, humidity, pm25 = next_mode_a(room_id)
-        elif mode == "c":
-            co2, temp, humidity, pm25 = next_mode_c(room_id, print_lock)
-        else:
-            co2, temp, humidity, pm25 = next_mode_b()
-
-        # Lab-A-205: always override temp with real ESP32 reading
-        temp_source = "simulated"
-        if room_id == "Lab-A-205":
-            real_temp, is_real = get_esp32_temp()
-            if is_real:
-                temp        = real_temp
-                temp_source = "real"
-                ROOM_STATE[room_id]["temp"] = real_temp
-
-        ai_data = get_thorough_ai_analysis(room_id, co2, temp, humidity, pm25)
-
-        state        = ROOM_STATE.get(room_id, {})
-        remediating  = state.get("remediating",     False)
-        action_taken = state.get("ai_action_taken", "NULL") if mode != "b" else "NULL"
-        cooldown     = state.get("cooldown_remaining", 0)
-
-        payload = {
-            "dtId":              dt_id,
-            "roomId":            room_id,
-            "co2":               co2,
-            "temperature":       temp,
-            "humidity":          humidity,
-            "pm2_5":             pm25,
-            "riskLevel":         ai_data.get("riskLevel"),
-            "possibleCauses":    ai_data.get("causes"),
-            "possibleSolutions": ai_data.get("solutions"),
-            "aiRecommendations": ai_data.get("recommendations"),
-            "remediating":       remediating,
-            "aiActionTaken":     action_taken,
-            "tempSource":        temp_source,
-        }
-
-        _print_counter[room_id] += 1
-        # Always print on High/Critical, otherwise respect frequency
-        should_print = (
-            (_print_counter[room_id] % every == 0) or
-            payload["riskLevel"] in ("High", "Critical")
-        )
 
+def print_virtual_summary(print_lock):
+    """One line for every virtual-room tick since the last call, by risk level."""
+    global _virtual_risk
+    with _virtual_risk_lock:
+        counts, _virtual_risk = _virtual_risk, {}
+    if counts:
         with print_lock:
-            if should_print:
-                print_lab_block(
-                    room_id      = room_id,
-                    risk_level   = ai_data.get("riskLevel", "Unknown"),
-                    co2          = co2,
-                    temp         = temp,
-                    humidity     = humidity,
-                    pm25         = pm25,
-                    temp_source  = temp_source,
-                    cause        = ai_data.get("causes", ""),
-                    solution     = ai_data.get("solutions", ""),
-                    remediating  = remediating,
-                    action_taken = action_taken,
-                    cooldown     = cooldown,
-                    mode         = mode,
-                )
-            if payload["riskLevel"] in ("High", "Critical"):
-                send_push_alert(
-                    room_id,
-                    payload["riskLevel"],
-                    payload["possibleCauses"],
-                    payload["possibleSolutions"]
-                )
+            print(f"  virtual rooms: {sum(counts.values())} readings  "
+                  + "  ".join(f"{level} {counts.get(level, 0)}" for level in RISK_LEVELS + ["Unknown"]))
+
+
+def virtual_summary_worker(print_lock):
+    while True:
+        time.sleep(TICK_SECS)
+        print_virtual_summary(print_lock)
+
+
+def simulate_room(room_info, print_lock, mode):
+    room_id = room_info["roomId"]
+    if _needs_esp32(room_id):
+        _wait_for_esp32(room_id, print_lock)
+
+    while True:
+        reading = _next_reading(room_id, print_lock, mode)
+        ai_data = get_gated_ai_analysis(room_id, *reading[:4])
+        payload = _report_tick(room_info, print_lock, mode, reading, ai_data)
+        if payload["riskLevel"] in ("High", "Critical"):
+            send_push_alert(
+                room_id,
+                payload["riskLevel"],
+                payload["possibleCauses"],
+                payload["possibleSolutions"]
+            )
 
         send_to_iot_hub(payload)
-        time.sleep(6)
+        time.sleep(TICK_SECS)
 
 
 # ---------------------------------------------------------------------------
@@ -859,7 +1158,12 @@ def run_simulation(mode):
     width  = 58
     print(f"\n{'═'*width}")
     print(f"  EcoGuardianAI  —  {labels[mode]}")
-    print(f"  Rooms: {', '.join(r['roomId'] for r in ROOMS)}")
+    if len(ROOMS) <= 6:
+        print(f"  Rooms: {', '.join(r['roomId'] for r in ROOMS)}")
+    else:
+        print(f"  Rooms: {len(ROOMS)} ({', '.join(r['roomId'] for r in ROOMS[:3])}, ...)")
+    if RUNTIME == "async":
+        print(f"  Runtime: asyncio, up to {MAX_CONCURRENCY} concurrent calls")
     print(f"{'═'*width}\n")
 
     for room in ROOMS:
@@ -870,20 +1174,385 @@ def run_simulation(mode):
     esp_thread = threading.Thread(target=esp32_listener, daemon=True)
     esp_thread.start()
 
+    if ENGINE == "numpy" and mode in ("b", "c"):
+        run_vector_simulation(mode)
+        return
+
     if mode == "c":
         t = threading.Thread(target=input_thread_worker, daemon=True)
         t.start()
 
     try:
-        with ThreadPoolExecutor(max_workers=len(ROOMS)) as executor:
-            futures = [
-                executor.submit(simulate_room, room, print_lock, mode)
-                for room in ROOMS
-            ]
-            for future in futures:
-                future.result()
+        if RUNTIME == "async":
+            asyncio.run(run_rooms_async(print_lock, mode))
+        else:
+            if VIRTUAL_ROOMS:
+                threading.Thread(target=virtual_summary_worker, args=(print_lock,), daemon=True).start()
+            with ThreadPoolExecutor(max_workers=len(ROOMS)) as executor:
+                futures = [
+                    executor.submit(simulate_room, room, print_lock, mode)
+                    for room in ROOMS
+                ]
+                for future in futures:
+                    future.result()
     except KeyboardInterrupt:
         print("\n\n  Simulation stopped.\n")
+        with _ai_lock:
+            calls, reused = _ai_counters["calls"], _ai_counters["reused"]
+        with _batch_ready:
+            batches, batched = _batch_counters["calls"], _batch_counters["rooms"]
+        stats = cache_stats()
+        print(f"  AI calls: {calls}   reused analyses: {reused}")
+        print(f"  Azure requests: {batches} for {batched} room analyses")
+        print(f"  Analysis cache: {stats['hits']} hits / {stats['misses']} misses "
+              f"(hit ratio {stats['hit_ratio']:.0%}), {stats['saved_calls']} Azure calls saved\n")
+
+
+# ---------------------------------------------------------------------------
+# 21. asyncio runtime (ECOGUARDIAN_RUNTIME=async)
+# ---------------------------------------------------------------------------
+# Rooms are tasks on one event loop rather than threads. Every outbound call
+# (Azure OpenAI, IoT Hub, ntfy) holds one shared semaphore, so MAX_CONCURRENCY
+# bounds sockets and helper threads however many rooms are simulated. Gating,
+# the analysis cache and batching work exactly as in the threaded runtime.
+_async_limit   = None    # asyncio.Semaphore shared by all outbound calls
+_async_client  = None    # AsyncAzureOpenAI
+_async_http    = None    # httpx.AsyncClient for ntfy
+_async_batches = None    # asyncio.Queue of (room_id, readings, Future)
+_async_tasks   = set()   # in-flight batch completions
+
+
+async def get_gated_ai_analysis_async(room_id, co2, temp, humidity, pm25):
+    reused, risk, bands = _gate_lookup(room_id, co2, temp, humidity, pm25)
+    if reused is not None:
+        return reused
+
+    key = _cache_key(room_id, co2, temp, humidity, pm25)
+    now = time.time()
+    ai_data = _cache_lookup(key, now)
+    if ai_data is None:
+        future = asyncio.get_running_loop().create_future()
+        await _async_batches.put((room_id, (co2, temp, humidity, pm25), future))
+        ai_data = await future
+        _cache_store(key, now, ai_data)
+        ai_data = dict(ai_data)
+    _gate_record(room_id, risk, bands, ai_data)
+    return ai_data
+
+
+async def _async_batch_worker():
+    while True:
+        batch = [await _async_batches.get()]
+        if _async_batches.qsize() < BATCH_MAX_ROOMS - 1:
+            await asyncio.sleep(BATCH_WINDOW_SECS)
+        while len(batch) < BATCH_MAX_ROOMS and not _async_batches.empty():
+            batch.append(_async_batches.get_nowait())
+        # Don't wait for the reply before collecting the next batch
+        task = asyncio.create_task(_analyze_batch_async(batch))
+        _async_tasks.add(task)
+        task.add_done_callback(_async_tasks.discard)
+
+
+async def _analyze_batch_async(batch):
+    requests = [(room_id, readings) for room_id, readings, _ in batch]
+    content  = None
+    try:
+        async with _async_limit:
+            response = await _async_client.chat.completions.create(
+                model=DEPLOYMENT_NAME,
+                messages=_batch_messages(requests),
+                temperature=0.2,
+                response_format={"type": "json_object"}
+            )
+        content = response.choices[0].message.content
+    except Exception:
+        pass
+    for (_, _, future), ai_data in zip(batch, _batch_results(requests, content)):
+        if not future.done():
+            future.set_result(ai_data)
+
+
+async def send_push_alert_async(room_id, risk_level, possible_causes, possible_solutions):
+    request = _alert_request(room_id, risk_level, possible_causes, possible_solutions)
+    if request is None:
+        return
+    url, body, headers = request
+    try:
+        async with _async_limit:
+            await _async_http.post(url, content=body, headers=headers)
+    except Exception:
+        pass
+
+
+async def send_to_iot_hub_async(payload):
+    # The IoT Hub helper is blocking; run it off the loop, within the limit
+    async with _async_limit:
+        await asyncio.to_thread(send_to_iot_hub, payload)
+
+
+async def simulate_room_async(room_info, print_lock, mode):
+    room_id = room_info["roomId"]
+    if _needs_esp32(room_id):
+        await asyncio.to_thread(_wait_for_esp32, room_id, print_lock)
+
+    while True:
+        reading = _next_reading(room_id, print_lock, mode)
+        ai_data = await get_gated_ai_analysis_async(room_id, *reading[:4])
+        payload = _report_tick(room_info, print_lock, mode, reading, ai_data)
+        if payload["riskLevel"] in ("High", "Critical"):
+            await send_push_alert_async(
+                room_id,
+                payload["riskLevel"],
+                payload["possibleCauses"],
+                payload["possibleSolutions"]
+            )
+
+        await send_to_iot_hub_async(payload)
+        await asyncio.sleep(TICK_SECS)
+
+
+async def _virtual_summary_async(print_lock):
+    while True:
+        await asyncio.sleep(TICK_SECS)
+        print_virtual_summary(print_lock)
+
+
+async def run_rooms_async(print_lock, mode):
+    global _async_limit, _async_client, _async_http, _async_batches
+    _async_limit   = asyncio.Semaphore(MAX_CONCURRENCY)
+    _async_batches = asyncio.Queue()
+    limits         = httpx.Limits(max_connections=MAX_CONCURRENCY)
+    _async_http    = httpx.AsyncClient(limits=limits, timeout=10)
+    _async_client  = AsyncAzureOpenAI(
+        api_version=API_VERSION,
+        azure_endpoint=ENDPOINT,
+        api_key=API_KEY,
+        http_client=DefaultAsyncHttpxClient(limits=limits),
+    )
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=MAX_CONCURRENCY))
+
+    background = [asyncio.create_task(_async_batch_worker())]
+    if VIRTUAL_ROOMS:
+        background.append(asyncio.create_task(_virtual_summary_async(print_lock)))
+    try:
+        await asyncio.gather(*(simulate_room_async(room, print_lock, mode) for room in ROOMS))
+    finally:
+        for task in background:
+            task.cancel()
+        await _async_client.close()
+        await _async_http.aclose()
+
+
+# ---------------------------------------------------------------------------
+# 22. Vectorized simulation engine (ECOGUARDIAN_ENGINE=numpy, Modes B and C)
+# ---------------------------------------------------------------------------
+# All rooms' state lives in NumPy arrays (one element per room, in ROOMS
+# order) and advances in one step per tick, drawing from the same
+# distributions as next_mode_b and the Mode C step functions. Meant for
+# load-testing the IoT pipeline with thousands of rooms: riskLevel comes from
+# the local classifier and no Azure OpenAI calls are made. Mode C has no
+# operator at this scale, so a High/Critical room accepts the remediation
+# with VECTOR_ACCEPT_PROB and declines otherwise, on the tick it is prompted.
+VECTOR_ACCEPT_PROB = 0.8
+ACTION_NAMES       = ["NULL", "Yes", "No"]    # codes stored in state["action"]
+
+_VECTOR_KEYS = [("co2", "co2_drift", "co2_ttl"), ("temp", "temp_drift", "temp_ttl"),
+                ("humidity", "hum_drift", "hum_ttl"), ("pm25", "pm_drift", "pm_ttl")]
+_START_DRIFT = {"co2_drift": 1, "temp_drift": 1, "hum_drift": -1, "pm_drift": 1}
+
+
+def _make_vector_state(mode, n, rng):
+    """Array form of _make_state for n rooms."""
+    if mode == "c":
+        co2      = rng.integers(MODE_C_START["co2"][0], MODE_C_START["co2"][1] + 1, n).astype(float)
+        temp     = np.round(rng.uniform(*MODE_C_START["temp"], n), 1)
+        humidity = np.round(rng.uniform(*MODE_C_START["humidity"], n), 1)
+        pm25     = np.round(rng.uniform(*MODE_C_START["pm25"], n), 1)
+    else:
+        co2, temp, humidity, pm25 = (np.full(n, v) for v in (650.0, 21.0, 45.0, 7.0))
+
+    state = {"co2": co2, "temp": temp, "humidity": humidity, "pm25": pm25, "rng": rng}
+    for drift_key, drift in _START_DRIFT.items():
+        state[drift_key] = np.full(n, drift, dtype=np.int8)
+    for ttl_key, ttl in (("co2_ttl", 18), ("temp_ttl", 25), ("hum_ttl", 20), ("pm_ttl", 15)):
+        state[ttl_key] = np.full(n, ttl, dtype=np.int32)
+    state["remediating"] = np.zeros(n, dtype=bool)
+    state["action"]      = np.zeros(n, dtype=np.int8)
+    state["cooldown"]    = np.zeros(n, dtype=np.int32)
+    return state
+
+
+def _vector_risk(co2, temp, humidity, pm25):
+    """_local_risk for arrays; returns indices into RISK_LEVELS."""
+    readings = {"co2": co2, "temp": temp, "humidity": humidity, "pm25": pm25}
+    level = np.zeros(len(co2), dtype=np.int8)
+    for metric, values in readings.items():
+        limits = THRESHOLDS[metric]
+        metric_level = sum((values >= limits[k]).astype(np.int8) for k in ("medium", "high", "critical"))
+        if "low_floor" in limits:
+            metric_level = np.where(values < limits["low_floor"], 1, metric_level)
+        level = np.maximum(level, metric_level)
+    return level
+
+
+def vector_mode_b(rng, n):
+    """next_mode_b for n rooms at once."""
+    readings = []
+    for metric in ("co2", "temp", "humidity", "pm25"):
+        buckets = MODE_B_BUCKETS[metric]
+        weights = np.array([w for w, _ in buckets])
+        lo, hi  = (np.array(bounds) for bounds in zip(*(b for _, b in buckets)))
+        pick    = rng.choice(len(buckets), size=n, p=weights / weights.sum())
+        if all(isinstance(v, int) for _, b in buckets for v in b):
+            readings.append(rng.integers(lo[pick], hi[pick] + 1).astype(float))
+        else:
+            readings.append(np.round(rng.uniform(lo[pick], hi[pick]), 1))
+    co2, temp, humidity, pm25 = readings
+    return co2.astype(int), temp, humidity.astype(int), pm25
+
+
+def _vector_step_normal(state, rows, key, drift_key, ttl_key):
+    rng = state["rng"]
+    n   = len(rows)
+    lo, hi, normal_step, spike_step, spike_prob = REALISTIC_PARAMS[key]
+    drift = state[drift_key][rows]
+    step  = np.where(rng.random(n) < spike_prob,
+                     rng.uniform(spike_step * 0.5, spike_step, n),
+                     rng.uniform(0, normal_step, n)) * drift
+    noise = rng.uniform(-normal_step * 0.3, normal_step * 0.3, n)
+    state[key][rows] = np.clip(np.round(state[key][rows] + step + noise, 1), lo, hi)
+
+    ttl  = state[ttl_key][rows] - 1
+    flip = ttl <= 0
+    state[drift_key][rows] = np.where(flip, -drift, drift)
+    state[ttl_key][rows]   = np.where(flip, rng.integers(10, 36, n), ttl)
+
+
+def _vector_step_remediate(state, rows, key):
+    lo, hi, normal_step, *_ = REALISTIC_PARAMS[key]
+    val   = state[key][rows]
+    noise = state["rng"].normal(0, normal_step * 0.25, len(rows))
+    state[key][rows] = np.clip(np.round(val + (SAFE_TARGETS[key] - val) * REMEDIATION_PULL + noise, 1), lo, hi)
+
+
+def _vector_step_drift_bad(state, rows, key, drift_key, ttl_key):
+    lo, hi, normal_step, spike_step, _ = REALISTIC_PARAMS[key]
+    step = state["rng"].uniform(normal_step * 1.0, spike_step * 0.7, len(rows))
+    if key == "humidity":
+        step = -step
+    state[key][rows]       = np.clip(np.round(state[key][rows] + step, 1), lo, hi)
+    state[drift_key][rows] = -1 if key == "humidity" else 1
+    state[ttl_key][rows]   = 9999
+
+
+def vector_mode_c(state):
+    """One Mode C tick for every room; returns (co2, temp, humidity, pm25) arrays."""
+    rng = state["rng"]
+    state["cooldown"] = np.maximum(state["cooldown"] - 1, 0)
+
+    remediating = np.flatnonzero(state["remediating"])
+    declined    = np.flatnonzero(~state["remediating"] & (state["action"] == 2))
+    drifting    = np.flatnonzero(~state["remediating"] & (state["action"] != 2))
+    for key, drift_key, ttl_key in _VECTOR_KEYS:
+        _vector_step_remediate(state, remediating, key)
+        _vector_step_drift_bad(state, declined, key, drift_key, ttl_key)
+        _vector_step_normal(state, drifting, key, drift_key, ttl_key)
+
+    # Remediated rooms that reached safe levels drift back up so the demo cycles
+    t, h = THRESHOLDS["temp"], THRESHOLDS["humidity"]
+    safe = (state["remediating"]
+            & (state["co2"] < THRESHOLDS["co2"]["medium"])
+            & (state["temp"] >= t["low_floor"]) & (state["temp"] < t["medium"])
+            & (state["humidity"] >= h["low_floor"]) & (state["humidity"] < h["medium"])
+            & (state["pm25"] < THRESHOLDS["pm25"]["medium"]))
+    done = np.flatnonzero(safe)
+    state["remediating"][done] = False
+    state["action"][done]      = 0
+    state["cooldown"][done]    = PROMPT_COOLDOWN
+    for (_, drift_key, ttl_key) in _VECTOR_KEYS:
+        state[drift_key][done] = _START_DRIFT[drift_key]
+        state[ttl_key][done]   = rng.integers(15, 26, len(done))
+
+    # Rooms that just turned High/Critical answer the prompt immediately
+    co2, humidity = state["co2"].astype(int), state["humidity"].astype(int)
+    temp, pm25    = np.round(state["temp"], 1), np.round(state["pm25"], 1)
+    prompted = np.flatnonzero(
+        ~state["remediating"] & ~safe
+        & (_vector_risk(co2, temp, humidity, pm25) >= 2)
+        & (state["cooldown"] == 0)
+        & (state["action"] != 2)
+    )
+    accepted = rng.random(len(prompted)) < VECTOR_ACCEPT_PROB
+    state["remediating"][prompted[accepted]] = True
+    state["action"][prompted]                = np.where(accepted, 1, 2)
+    state["cooldown"][prompted]              = PROMPT_COOLDOWN
+    for (_, drift_key, ttl_key) in _VECTOR_KEYS:
+        state[drift_key][prompted[~accepted]] = -1 if drift_key == "hum_drift" else 1
+        state[ttl_key][prompted[~accepted]]   = 9999
+    return co2, temp, humidity, pm25
+
+
+def run_vector_simulation(mode):
+    if np is None:
+        print("❌  numpy is required for ECOGUARDIAN_ENGINE=numpy (pip install numpy)")
+        return
+    rng   = np.random.default_rng(int(SEED) if SEED is not None else None)
+    n     = len(ROOMS)
+    state = _make_vector_state(mode, n, rng)
+    esp32 = next((i for i, r in enumerate(ROOMS) if r["roomId"] == "Lab-A-205"), None)
+
+    tick = 0
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as publisher:
+            while True:
+                started = time.perf_counter()
+                if mode == "c":
+                    co2, temp, humidity, pm25 = vector_mode_c(state)
+                else:
+                    co2, temp, humidity, pm25 = vector_mode_b(rng, n)
+
+                temp_source = ["simulated"] * n
+                real_temp, is_real = get_esp32_temp()
+                if esp32 is not None and is_real:
+                    temp[esp32], temp_source[esp32] = real_temp, "real"
+                    state["temp"][esp32] = real_temp
+                risk    = _vector_risk(co2, temp, humidity, pm25)
+                stepped = time.perf_counter()
+
+                remediating = state["remediating"].tolist()
+                actions     = state["action"].tolist() if mode == "c" else [0] * n
+                payloads = [
+                    {
+                        "dtId":              room["dtId"],
+                        "roomId":            room["roomId"],
+                        "co2":               c,
+                        "temperature":       t,
+                        "humidity":          h,
+                        "pm2_5":             p,
+                        "riskLevel":         RISK_LEVELS[r],
+                        "possibleCauses":    None,
+                        "possibleSolutions": None,
+                        "aiRecommendations": None,
+                        "remediating":       rem,
+                        "aiActionTaken":     ACTION_NAMES[a],
+                        "tempSource":        src,
+                    }
+                    for room, c, t, h, p, r, rem, a, src in zip(
+                        ROOMS, co2.tolist(), temp.tolist(), humidity.tolist(), pm25.tolist(),
+                        risk.tolist(), remediating, actions, temp_source)
+                ]
+                list(publisher.map(send_to_iot_hub, payloads))
+                published = time.perf_counter()
+
+                tick += 1
+                counts = np.bincount(risk, minlength=4)
+                print(f"  tick {tick}: {n} rooms  step {(stepped - started) * 1000:.1f}ms  "
+                      f"publish {published - stepped:.2f}s  "
+                      + "  ".join(f"{name} {c}" for name, c in zip(RISK_LEVELS, counts)))
+                time.sleep(max(0.0, TICK_SECS - (published - started)))
+    except KeyboardInterrupt:
+        print(f"\n\n  Simulation stopped after {tick} ticks.\n")
 
 
 if __name__ == "__main__":
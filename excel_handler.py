@@ -1,72 +1,470 @@
-import openpyxl
-from openpyxl import load_workbook, Workbook
+from bisect import bisect_right
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import atexit
+import hashlib
 import os
+import queue
+import threading
+import time
+import metrics
+from storage import XlsxStorage, SQLiteStorage
+
+def _completed_at(value):
+    """date_completed as a datetime, or None if it is blank or unparseable."""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), '%m/%d/%Y %I:%M %p')
+    except ValueError:
+        return None
 
 class ExcelHandler:
-    def __init__(self, workers_file='data/workers.xlsx', tasks_file='data/tasks.xlsx'):
+    def __init__(self, workers_file='data/workers.xlsx', tasks_file='data/tasks.xlsx', backend=None, write_behind=None):
         base_dir = os.path.dirname(os.path.abspath(__file__))
-        self.workers_file = os.path.join(base_dir, 'data', 'workers.xlsx')
-        self.tasks_file = os.path.join(base_dir, 'data', 'tasks.xlsx')
-        self._ensure_files_exist()
+        # DATA_DIR points a process (e.g. the benchmarks) at a different set of files
+        self.data_dir = os.getenv('DATA_DIR') or os.path.join(base_dir, 'data')
+        self.workers_file = os.path.join(self.data_dir, 'workers.xlsx')
+        self.tasks_file = os.path.join(self.data_dir, 'tasks.xlsx')
+        self.db_file = os.path.join(self.data_dir, 'qarbon.db')
+        # 'xlsx' (default) keeps the spreadsheets as the source of truth; 'sqlite' moves
+        # the live data into data/qarbon.db and treats the spreadsheets as import/export.
+        self.backend = backend or os.getenv('TASK_STORAGE', 'xlsx')
+        self.storage = self._make_storage()
+        # Parsed sheets keyed by sheet name: {sheet: (signature, rows)}
+        self._cache = {}
+        self._cache_lock = threading.RLock()
+        # Write-behind: completions/assignments are coalesced per task in memory and
+        # flushed as one batch every `write_behind` seconds (0 disables).
+        self.write_behind = float(write_behind if write_behind is not None else os.getenv('WRITE_BEHIND_SECS', 0))
+        self._pending = {}
+        # Bumped on every buffered update so versions change before the flush lands
+        self._pending_generation = 0
+        # Change-event subscribers (one bounded queue per stream); events raised inside
+        # batch() are held until it commits.
+        self._subscribers = set()
+        self._batch_events = None
+        self._published_version = None
+        # (rows list the indexes were built from, {index name: ...}) for the tasks sheet
+        self._task_indexes = None
+        # Completed tasks older than this many days move to the archive store (0 disables)
+        self.archive_after_days = int(os.getenv('ARCHIVE_AFTER_DAYS', 0))
+        # Flusher/archiver threads start on first use in the serving process, never in a
+        # preloading gunicorn master (see _ensure_threads)
+        self._stop_flusher = threading.Event()
+        self._threads_pid = None
+        if self.write_behind > 0:
+            atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
 
-    def _get_est_time(self):
+    def _ensure_threads(self):
+        # Threads don't survive fork, so start them in the process that uses the handler
+        if self._threads_pid == os.getpid():
+            return
+        self._threads_pid = os.getpid()
+        if self.write_behind > 0:
+            self._stop_flusher = threading.Event()
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+        if self.archive_after_days > 0:
+            threading.Thread(target=self._archive_loop, daemon=True).start()
+
+    def _after_fork(self):
+        # Parsed rows stay shared with the parent (copy-on-write); locks, streams,
+        # buffered writes and threads belong to the parent and are not inherited.
+        self._cache_lock = threading.RLock()
+        self._subscribers = set()
+        self._pending = {}
+
+    def _make_storage(self):
+        if self.backend == 'sqlite':
+            storage = SQLiteStorage(self.db_file)
+            if storage.is_empty() and os.path.exists(self.workers_file) and os.path.exists(self.tasks_file):
+                storage.import_xlsx(self.workers_file, self.tasks_file)
+            return storage
+        if self.backend == 'xlsx':
+            return XlsxStorage(self.workers_file, self.tasks_file)
+        raise ValueError(f"Unknown TASK_STORAGE backend: {self.backend}")
+
+    def _est_now(self):
         # Adjusts Render's UTC time to Eastern Standard Time
-        return (datetime.utcnow() - timedelta(hours=5)).strftime('%m/%d/%Y %I:%M %p')
-
-    def _ensure_files_exist(self):
-        os.makedirs(os.path.dirname(self.workers_file), exist_ok=True)
-        if not os.path.exists(self.workers_file):
-            wb = Workbook()
-            ws = wb.active
-            ws.append(['Name', 'Job Title', 'Date Working'])
-            wb.save(self.workers_file)
-        if not os.path.exists(self.tasks_file):
-            wb = Workbook()
-            ws = wb.active
-            ws.append(['Urgency', 'Task Description', 'Date Assigned', 'Date Completed', 'Assigned To'])
-            wb.save(self.tasks_file)
+        return datetime.utcnow() - timedelta(hours=5)
+
+    def _get_est_time(self):
+        return self._est_now().strftime('%m/%d/%Y %I:%M %p')
+
+    def _entry(self, sheet):
+        """(signature, rows) for a sheet, only re-reading storage when it changed underneath us."""
+        with self._cache_lock:
+            signature = self.storage.signature(sheet)
+            entry = self._cache.get(sheet)
+            if entry is None or entry[0] != signature:
+                with metrics.span('storage_load', sheet=sheet):
+                    entry = (signature, self.storage.load(sheet))
+                self._cache[sheet] = entry
+            return entry
+
+    def _indexed_tasks(self):
+        """Cached task rows plus lookup indexes, rebuilt only when the rows are reloaded."""
+        with self._cache_lock:
+            rows = self._entry('tasks')[1]
+            if self._task_indexes is None or self._task_indexes[0] is not rows:
+                # Every position list is in id order so cursors can bisect it
+                order = sorted(range(len(rows)), key=lambda i: rows[i]['id'])
+                by_id, by_assignee, by_urgency, open_, completed = {}, {}, {}, [], []
+                for i in order:
+                    r = rows[i]
+                    by_id[r['id']] = i
+                    if r['assigned_to']:
+                        by_assignee.setdefault(r['assigned_to'], []).append(i)
+                    by_urgency.setdefault(str(r['urgency']), []).append(i)
+                    (completed if r['date_completed'] else open_).append(i)
+                self._task_indexes = (rows, {'all': order, 'by_id': by_id, 'by_assignee': by_assignee,
+                                             'by_urgency': by_urgency, 'open': open_, 'completed': completed})
+            return rows, self._task_indexes[1]
+
+    def _with_pending(self, row):
+        pending = self._pending.get(row['id'])
+        return dict(row, **pending) if pending else dict(row)
+
+    def _cached_rows(self, sheet):
+        with self._cache_lock:
+            rows = [dict(r) for r in self._entry(sheet)[1]]
+            if sheet == 'tasks' and self._pending:
+                for r in rows:
+                    r.update(self._pending.get(r['id'], {}))
+            return rows
+
+    def subscribe(self, maxsize=256, limit=None):
+        """Returns a queue that receives change events until passed to unsubscribe(),
+        or None when `limit` subscribers are already connected."""
+        with self._cache_lock:
+            if limit is not None and len(self._subscribers) >= limit:
+                return None
+            self._ensure_threads()
+            if self._published_version is None:
+                self._published_version = self.version()
+            q = queue.Queue(maxsize)
+            self._subscribers.add(q)
+            return q
+
+    def unsubscribe(self, q):
+        with self._cache_lock:
+            self._subscribers.discard(q)
+
+    def _emit(self, event_type, **data):
+        with self._cache_lock:
+            if self._batch_events is not None:
+                self._batch_events.append((event_type, data))
+            else:
+                self._publish([(event_type, data)])
+
+    def _publish(self, events):
+        if not self._subscribers:
+            return
+        version = self.version()
+        self._published_version = version
+        for event_type, data in events:
+            event = dict(data, type=event_type, version=version)
+            for q in list(self._subscribers):
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    pass  # slow consumer; its stream notices the version gap and resyncs
+
+    def _check_external_changes(self):
+        """Tells subscribers to resync if another process changed the data since our last event."""
+        if self._subscribers and self._batch_events is None and self.version() != self._published_version:
+            self._publish([('resync', {})])
+
+    def _mutate(self, sheet, method, *args, **kwargs):
+        with self._cache_lock:
+            self._ensure_threads()
+            self._check_external_changes()
+            # Keep storage ordering identical to call ordering
+            self.flush()
+            with metrics.span('storage_write', op=method):
+                result = getattr(self.storage, method)(*args, **kwargs)
+            self._cache.pop(sheet, None)
+            return result
+
+    def _update_task(self, task_id, **fields):
+        with self._cache_lock:
+            self._ensure_threads()
+            if self.write_behind > 0:
+                self._check_external_changes()
+                # Storage would raise on the flush; unknown ids must fail now, like unbuffered writes
+                if int(task_id) not in self._indexed_tasks()[1]['by_id']:
+                    raise KeyError(task_id)
+                self._pending.setdefault(int(task_id), {}).update(fields)
+                self._pending_generation += 1
+            else:
+                self._mutate('tasks', 'update_task', task_id, **fields)
+
+    @contextmanager
+    def batch(self):
+        """Applies every mutation inside the block with a single load/save (or one SQL transaction).
+
+        Reads made inside the block see the data as it was before the batch.
+        """
+        with self._cache_lock:
+            if self._batch_events is not None:
+                yield self
+                return
+            self._check_external_changes()
+            self._batch_events = []
+            try:
+                with metrics.span('storage_batch'), self.storage.transaction():
+                    yield self
+                self._cache.clear()
+                events = self._batch_events
+            finally:
+                self._batch_events = None
+            self._publish(events)
+
+    def flush(self):
+        """Writes any buffered write-behind updates to storage."""
+        with self._cache_lock:
+            if not self._pending:
+                return
+            self._check_external_changes()
+            pending, self._pending = self._pending, {}
+            try:
+                with metrics.span('storage_flush'), self.storage.transaction():
+                    for task_id, fields in pending.items():
+                        try:
+                            self.storage.update_task(task_id, **fields)
+                        except KeyError:
+                            pass  # deleted before the flush
+            except Exception:
+                self._pending = pending
+                raise
+            self._cache.pop('tasks', None)
+            # Our own write: streams adopt the new version instead of resyncing
+            self._emit('flushed')
+
+    def _flush_loop(self):
+        while not self._stop_flusher.wait(self.write_behind):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def close(self):
+        self._stop_flusher.set()
+        self.flush()
+
+    def version(self, *sheets):
+        """Opaque token that changes whenever any of the given sheets (default: both) changes."""
+        with self._cache_lock:
+            self._ensure_threads()
+            parts = [(sheet, self._entry(sheet)[0]) for sheet in sheets or ('tasks', 'workers')]
+            if self._pending and 'tasks' in (sheets or ('tasks',)):
+                parts.append(('pending', os.getpid(), self._pending_generation))
+            return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+    def snapshot(self):
+        """Tasks and workers from one consistent read, with the matching version."""
+        with self._cache_lock:
+            return {'version': self.version(), 'tasks': self.read_tasks(), 'workers': self.read_workers()}
+
+    def warm(self):
+        """Parses both sheets and builds the task indexes now rather than on the first request."""
+        with self._cache_lock:
+            self._entry('workers')
+            self._indexed_tasks()
 
     def read_workers(self):
-        wb = load_workbook(self.workers_file)
-        return [{'name': r[0], 'job_title': r[1], 'date_working': r[2]} for r in wb.active.iter_rows(min_row=2, values_only=True) if r[0]]
+        return self._cached_rows('workers')
 
     def read_tasks(self):
-        wb = load_workbook(self.tasks_file)
-        return [{'row_number': i, 'urgency': r[0], 'description': r[1], 'date_assigned': r[2], 'date_completed': r[3], 'assigned_to': r[4]} 
-                for i, r in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2) if r[1]]
+        return self._cached_rows('tasks')
+
+    def iter_rows(self, sheet):
+        """Yields a sheet's rows lazily: from the cache when it is current, otherwise
+        streamed from storage without materialising (or caching) the whole sheet."""
+        with self._cache_lock:
+            entry = self._cache.get(sheet)
+            fresh = entry is not None and entry[0] == self.storage.signature(sheet)
+            pending = {tid: dict(f) for tid, f in self._pending.items()} if sheet == 'tasks' else {}
+        for r in entry[1] if fresh else self.storage.iter_rows(sheet):
+            yield dict(r, **pending.get(r.get('id'), {}))
+
+    def iter_workers(self):
+        return self.iter_rows('workers')
+
+    def iter_tasks(self):
+        return self.iter_rows('tasks')
+
+    def read_worker_tasks(self, name, status='open', offset=0, limit=None):
+        """A worker's tasks via the assignee index, in id order. Returns (page, total).
+
+        status is 'open', 'completed' or 'all'.
+        """
+        with self._cache_lock:
+            rows, indexes = self._indexed_tasks()
+            positions = indexes['by_assignee'].get(name, [])
+            if self._pending:
+                # Buffered assignments haven't reached the index yet
+                moved = {indexes['by_id'][tid] for tid, f in self._pending.items() if 'assigned_to' in f and tid in indexes['by_id']}
+                positions = sorted(set(positions) | moved)
+            tasks = [t for t in (self._with_pending(rows[i]) for i in positions) if t['assigned_to'] == name]
+            if status == 'open':
+                tasks = [t for t in tasks if not t['date_completed']]
+            elif status == 'completed':
+                tasks = [t for t in tasks if t['date_completed']]
+            end = None if limit is None else offset + limit
+            return tasks[offset:end], len(tasks)
+
+    def query_tasks(self, status=None, urgency=None, assignee=None, cursor=None, limit=None):
+        """Filtered tasks in id order, served from the task indexes. Returns (page, next_cursor).
+
+        status is 'open' or 'completed', urgency a list of levels, and cursor the last id
+        of the previous page; next_cursor is None once there are no more pages.
+        """
+        with self._cache_lock:
+            rows, indexes = self._indexed_tasks()
+            # Scan the smallest index that covers the filters, then check the rest per row
+            candidates = [indexes['all']]
+            if status in ('open', 'completed'):
+                candidates.append(indexes[status])
+            if assignee is not None:
+                candidates.append(indexes['by_assignee'].get(assignee, []))
+            if urgency is not None:
+                urgency = {str(u) for u in urgency}
+                candidates.append(sorted((i for u in urgency for i in indexes['by_urgency'].get(u, [])), key=lambda i: rows[i]['id']))
+            positions = min(candidates, key=len)
+            if self._pending:
+                # Buffered updates haven't reached the indexes yet
+                touched = {indexes['by_id'][tid] for tid in self._pending if tid in indexes['by_id']}
+                positions = sorted(set(positions) | touched, key=lambda i: rows[i]['id'])
+            start = 0 if cursor is None else bisect_right(positions, int(cursor), key=lambda i: rows[i]['id'])
+            page = []
+            for i in range(start, len(positions)):
+                t = self._with_pending(rows[positions[i]])
+                if status == 'open' and t['date_completed'] or status == 'completed' and not t['date_completed']:
+                    continue
+                if assignee is not None and t['assigned_to'] != assignee:
+                    continue
+                if urgency is not None and str(t['urgency']) not in urgency:
+                    continue
+                page.append(t)
+                if limit is not None and len(page) == limit:
+                    more = i + 1 < len(positions)
+                    return page, (t['id'] if more else None)
+            return page, None
 
-    def update_task_completion(self, row_number):
-        wb = load_workbook(self.tasks_file)
-        wb.active.cell(row=int(row_number), column=4, value=self._get_est_time())
-        wb.save(self.tasks_file)
+    def read_archive(self):
+        return self._cached_rows('archive')
 
-    def assign_task_to_worker(self, row_number, worker_name):
-        wb = load_workbook(self.tasks_file)
-        wb.active.cell(row=int(row_number), column=5, value=worker_name)
-        wb.save(self.tasks_file)
+    def archive_completed(self, days):
+        """Moves tasks completed more than `days` days ago to the archive store; returns their ids."""
+        cutoff = self._est_now() - timedelta(days=days)
+        with self._cache_lock:
+            # Buffered completions must be on disk before the rows can move
+            self.flush()
+            done = ((t['id'], _completed_at(t['date_completed'])) for t in self.iter_tasks())
+            ids = [task_id for task_id, at in done if at and at < cutoff]
+            if not ids:
+                return []
+            self._mutate('tasks', 'archive_tasks', ids)
+            self._cache.pop('archive', None)
+        self._emit('tasks_archived', ids=ids)
+        return ids
 
-    def delete_task(self, row_number):
-        wb = load_workbook(self.tasks_file)
-        wb.active.delete_rows(int(row_number))
-        wb.save(self.tasks_file)
+    def _archive_loop(self):
+        while True:
+            try:
+                self.archive_completed(self.archive_after_days)
+            except Exception:
+                pass
+            time.sleep(3600)
+
+    def update_task_completion(self, task_id):
+        completed = self._get_est_time()
+        self._update_task(task_id, date_completed=completed)
+        self._emit('task_completed', id=int(task_id), date_completed=completed)
+
+    def assign_task_to_worker(self, task_id, worker_name):
+        self._update_task(task_id, assigned_to=worker_name)
+        self._emit('task_assigned', id=int(task_id), assigned_to=worker_name)
+
+    def delete_task(self, task_id):
+        self._mutate('tasks', 'delete_task', task_id)
+        self._emit('task_deleted', id=int(task_id))
 
     def delete_worker(self, name):
-        wb = load_workbook(self.workers_file)
-        ws = wb.active
-        for row in range(2, ws.max_row + 1):
-            if ws.cell(row=row, column=1).value == name:
-                ws.delete_rows(row)
-                break
-        wb.save(self.workers_file)
+        self._mutate('workers', 'delete_worker', name)
+        self._emit('worker_removed', name=name)
 
     def add_worker(self, name, job_title, date_working):
-        wb = load_workbook(self.workers_file)
-        wb.active.append([name, job_title, date_working])
-        wb.save(self.workers_file)
+        self._mutate('workers', 'add_worker', name, job_title, date_working)
+        self._emit('worker_added', worker={'name': name, 'job_title': job_title, 'date_working': date_working})
 
     def add_task(self, urgency, description):
-        wb = load_workbook(self.tasks_file)
-        est_date = (datetime.utcnow() - timedelta(hours=5)).strftime('%m/%d/%Y')
-        wb.active.append([urgency, description, est_date, '', ''])
-        wb.save(self.tasks_file)
+        est_date = self._est_now().strftime('%m/%d/%Y')
+        task_id = self._mutate('tasks', 'add_task', urgency, description, est_date)
+        self._emit('task_added', task={'id': task_id, 'urgency': urgency, 'description': description,
+                                       'date_assigned': est_date, 'date_completed': None, 'assigned_to': None})
+        return task_id
+
+    def _bulk(self, items, apply):
+        """Applies apply(item) to every item in one batch; returns a result dict per item.
+
+        apply raises ValueError for invalid input and KeyError for unknown tasks, which
+        fail only that item.
+        """
+        results = []
+        with self.batch():
+            for item in items:
+                try:
+                    results.append(dict(apply(item) or {}, success=True))
+                except KeyError:
+                    results.append({'success': False, 'message': 'Task not found'})
+                except ValueError as e:
+                    results.append({'success': False, 'message': str(e)})
+        return results
+
+    def add_tasks(self, items):
+        def apply(item):
+            if not isinstance(item, dict) or not str(item.get('description') or '').strip():
+                raise ValueError('description is required')
+            try:
+                urgency = int(item.get('urgency'))
+            except (TypeError, ValueError):
+                raise ValueError('urgency must be a number from 1 to 5')
+            if not 1 <= urgency <= 5:
+                raise ValueError('urgency must be a number from 1 to 5')
+            return {'id': self.add_task(urgency, str(item['description']).strip())}
+        return self._bulk(items, apply)
+
+    def add_workers(self, items):
+        def apply(item):
+            if not isinstance(item, dict) or not str(item.get('name') or '').strip() or not str(item.get('job_title') or '').strip():
+                raise ValueError('name and job_title are required')
+            self.add_worker(str(item['name']).strip(), str(item['job_title']).strip(), item.get('date_working'))
+            return {'name': str(item['name']).strip()}
+        return self._bulk(items, apply)
+
+    def _task_ids_op(self, task_ids, operation):
+        # Checked up front so buffered (write-behind) completions also report unknown ids
+        known = self._indexed_tasks()[1]['by_id']
+        def apply(task_id):
+            try:
+                task_id = int(task_id)
+            except (TypeError, ValueError):
+                raise ValueError('task_id must be an integer')
+            if task_id not in known:
+                raise KeyError(task_id)
+            operation(task_id)
+            return {'id': task_id}
+        return self._bulk(task_ids, apply)
+
+    def complete_tasks(self, task_ids):
+        return self._task_ids_op(task_ids, self.update_task_completion)
+
+    def delete_tasks(self, task_ids):
+        return self._task_ids_op(task_ids, self.delete_task)
+
+    def export_xlsx(self, sheet, target):
+        self.storage.export_xlsx(sheet, target)
@@ -0,0 +1,11 @@
+import gc
+
+# The master imports the app and parses the workbooks once; workers are forked from it
+# and share those pages copy-on-write. Connections and threads are re-created in each
+# worker by the os.register_at_fork hooks in storage.py, excel_handler.py and ai_engine.py.
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Keep the collector from touching (and so copying) the preloaded objects in workers
+    gc.freeze()
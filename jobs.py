@@ -0,0 +1,191 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from queue import Queue, Full
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, queue, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = 'queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = self.updated = time.time()
+        self._queue = queue
+
+    def update(self, **progress):
+        """Records progress for pollers, e.g. job.update(stage='saving', done=3, total=40)."""
+        self.progress.update(progress)
+        self._queue._persist(self)
+
+    def to_dict(self):
+        return {'id': self.id, 'key': self.key, 'status': self.status, 'progress': self.progress,
+                'result': self.result, 'error': self.error, 'created': self.created, 'updated': self.updated}
+
+
+class JobQueue:
+    """Bounded background queue with per-key de-duplication.
+
+    Job state is mirrored to JSON files in `state_dir`, so a status poll served by a
+    different gunicorn worker still finds the job, and a key marker file stops two
+    processes from starting the same run.
+    """
+
+    CLAIM_ATTEMPTS = 3
+
+    def __init__(self, state_dir, workers=1, maxsize=8, keep_for=900):
+        self.state_dir = state_dir
+        self.workers = workers
+        self.keep_for = keep_for
+        self._pending = Queue(maxsize)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _ensure_workers(self):
+        # Threads don't survive fork, so start them in the process that uses the queue
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        for i in range(self.workers):
+            threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True).start()
+
+    def submit(self, key, fn):
+        """Queues fn(job) unless a job with the same key is already queued or running; returns the job dict."""
+        with self._lock:
+            self._ensure_workers()
+            self._prune()
+            existing = self._active_job(key)
+            if existing:
+                return existing
+            # Written before the key is claimed, so other processes never see a marker without its job
+            job = Job(self, key)
+            self._persist(job)
+            for _ in range(self.CLAIM_ATTEMPTS):
+                if self._claim_key(key, job.id):
+                    break
+                # Lost the race: share the winner's job, or retry once its stale marker is gone
+                existing = self._active_job(key)
+                if existing:
+                    os.unlink(self._path(job.id))
+                    return existing
+            else:
+                os.unlink(self._path(job.id))
+                raise QueueFull(key)
+            self._jobs[job.id] = job
+            try:
+                self._pending.put_nowait((job, fn))
+            except Full:
+                del self._jobs[job.id]
+                self._release_key(key, job.id)
+                os.unlink(self._path(job.id))
+                raise QueueFull(key)
+            return job.to_dict()
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job:
+            return job.to_dict()
+        return self._read(self._path(job_id))
+
+    def _run(self):
+        while True:
+            job, fn = self._pending.get()
+            job.status = 'running'
+            self._persist(job)
+            try:
+                job.result = fn(job)
+                job.status = 'done'
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                job.status = 'failed'
+            self._persist(job)
+            self._release_key(job.key, job.id)
+
+    def _active_job(self, key):
+        marker = self._read(self._key_path(key))
+        if not marker:
+            return None
+        if not self._alive(marker['pid']):
+            self._release_key(key, marker['id'])
+            return None
+        job = self.get(marker['id'])
+        if not job:
+            # Owner is alive but its job file is gone or not readable yet: still its run
+            return {'id': marker['id'], 'key': key, 'status': 'queued', 'progress': {}, 'result': None,
+                    'error': None, 'created': None, 'updated': None}
+        if job['status'] in ('queued', 'running'):
+            return job
+        # Stale marker from a finished job
+        self._release_key(key, marker['id'])
+        return None
+
+    def _claim_key(self, key, job_id):
+        # Linking a complete temp file claims atomically, so a marker is never read half-written
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'id': job_id, 'pid': os.getpid()}, f)
+        try:
+            os.link(tmp_path, self._key_path(key))
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp_path)
+        return True
+
+    def _release_key(self, key, job_id):
+        marker = self._read(self._key_path(key))
+        if marker and marker['id'] == job_id:
+            try:
+                os.unlink(self._key_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _alive(self, pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_for
+        for job_id, job in list(self._jobs.items()):
+            if job.status in ('done', 'failed') and job.updated < cutoff:
+                del self._jobs[job_id]
+                try:
+                    os.unlink(self._path(job_id))
+                except FileNotFoundError:
+                    pass
+
+    def _path(self, job_id):
+        return os.path.join(self.state_dir, f'{job_id}.json')
+
+    def _key_path(self, key):
+        return os.path.join(self.state_dir, f'key-{key}.json')
+
+    def _persist(self, job):
+        job.updated = time.time()
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(job.to_dict(), f, default=str)
+        os.replace(tmp_path, self._path(job.id))
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,161 @@
+"""In-process counters, latency histograms and request spans.
+
+Rendered in Prometheus text format by /metrics; spans recorded while serving a request
+can also be returned in a Server-Timing header. Each gunicorn worker keeps its own
+numbers, so a scrape sees the worker that answered it.
+
+METRICS_ENABLED=0 turns every call here into an early return.
+"""
+from bisect import bisect_left
+from contextlib import nullcontext
+import os
+import threading
+import time
+
+ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+SERVER_TIMING = ENABLED and os.getenv('SERVER_TIMING', '0') == '1'
+
+# Histogram upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HELP = {
+    'qarbon_http_request_seconds': 'Time to build each response, by route',
+    'qarbon_span_seconds': 'Time spent in instrumented sections (storage, serialisation, model calls)',
+    'qarbon_ai_requests_total': 'Model completion attempts by outcome',
+    'qarbon_ai_tokens_total': 'Tokens used by model completions',
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [count per bucket..., count above the last bucket, sum]
+_gauges = {}      # name -> (help, fn returning the current value)
+_local = threading.local()
+_NOOP = nullcontext()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        h[bisect_left(BUCKETS, seconds)] += 1
+        h[-1] += seconds
+
+
+def gauge(name, fn, help=''):
+    """Registers fn() to be sampled at scrape time."""
+    _gauges[name] = (help, fn)
+
+
+class _Span:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        observe('qarbon_span_seconds', elapsed, span=self.name, **self.labels)
+        spans = getattr(_local, 'spans', None)
+        if spans is not None:
+            spans.append((self.name, elapsed))
+
+
+def span(name, **labels):
+    """Context manager timing a section into qarbon_span_seconds{span=name}."""
+    return _Span(name, labels) if ENABLED else _NOOP
+
+
+def start_request():
+    """Starts collecting spans for the current thread's request; returns the start time."""
+    _local.spans = []
+    return time.perf_counter()
+
+
+def finish_request():
+    spans, _local.spans = getattr(_local, 'spans', None) or [], None
+    return spans
+
+
+def server_timing(spans, total):
+    """Server-Timing header value: one entry per span name (summed) plus the whole request."""
+    totals = {}
+    for name, elapsed in spans:
+        totals[name] = totals.get(name, 0) + elapsed
+    entries = [f'{name};dur={elapsed * 1000:.1f}' for name, elapsed in totals.items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """Everything recorded so far in Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(h) for key, h in _histograms.items()}
+    lines, typed = [], set()
+
+    def header(name, kind, help):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, 'counter', HELP.get(name, ''))
+        lines.append(f'{name}{_labels(labels)} {value}')
+    for (name, labels), h in sorted(histograms.items()):
+        header(name, 'histogram', HELP.get(name, ''))
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), h[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {h[-1]:.6f}')
+        lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    for name, (help, fn) in sorted(_gauges.items()):
+        try:
+            value = fn()
+        except Exception:
+            continue
+        header(name, 'gauge', help)
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _after_fork():
+    # Each worker reports its own numbers, not the preloading master's warm-up
+    global _lock
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,489 @@
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from openpyxl import load_workbook, Workbook
+from openpyxl.packaging.custom import IntProperty
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single-process only
+    fcntl = None
+
+WORKER_HEADERS = ['Name', 'Job Title', 'Date Working']
+TASK_HEADERS = ['Urgency', 'Task Description', 'Date Assigned', 'Date Completed', 'Assigned To', 'Task ID']
+
+# Spreadsheet column (1-based) for each mutable task field
+TASK_COLUMNS = {'date_completed': 4, 'assigned_to': 5}
+ID_COLUMN = 6
+# Workbook custom property holding the next task id, so deleted ids are never reused
+NEXT_ID_PROPERTY = 'NextTaskId'
+
+
+def _worker_row(r):
+    return {'name': r[0], 'job_title': r[1], 'date_working': r[2]}
+
+
+def _task_row(task_id, r):
+    return {'id': task_id, 'urgency': r[0], 'description': r[1], 'date_assigned': r[2], 'date_completed': r[3], 'assigned_to': r[4]}
+
+
+def _new_workbook(headers, rows=()):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(headers)
+    for r in rows:
+        ws.append(r)
+    return wb
+
+
+class _MissingIds(Exception):
+    """The tasks sheet has rows without a Task ID (added by hand in Excel)."""
+
+
+class XlsxStorage:
+    """Workbook-per-sheet storage; every mutation is a full load + save of the file.
+
+    Read-modify-write holds an exclusive flock on a sidecar lock file and saves via
+    temp file + rename, so several gunicorn workers can share the same workbooks.
+    Parses take a shared lock, and a rename never exposes a half-written file.
+    """
+
+    def __init__(self, workers_file, tasks_file, archive_file=None):
+        archive_file = archive_file or os.path.join(os.path.dirname(tasks_file), 'tasks_archive.xlsx')
+        self.paths = {'workers': workers_file, 'tasks': tasks_file, 'archive': archive_file}
+        self.lock_path = os.path.join(os.path.dirname(tasks_file), '.workbooks.lock')
+        # Held flock (fd, exclusive) for this process, None when unlocked
+        self._flock = None
+        self._thread_lock = threading.RLock()
+        # Open workbooks for the current transaction, None outside of one
+        self._tx = None
+        # Cached task id -> sheet row, valid while the file signature matches
+        self._index = None
+        self._index_signature = None
+        self._ensure_files_exist()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A parent thread may have held these at fork time. The inherited flock fd shares the
+        # parent's open file description, so keeping it would hold the lock for the child's
+        # lifetime; close our copy (never LOCK_UN, which would release the parent's lock too).
+        self._thread_lock = threading.RLock()
+        if self._flock is not None:
+            try:
+                os.close(self._flock[0])
+            except OSError:
+                pass
+        self._flock = None
+        self._tx = None
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        with self._thread_lock:
+            if self._flock is not None:
+                if exclusive and not self._flock[1]:
+                    raise RuntimeError('cannot upgrade a shared workbook lock')
+                yield
+                return
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                self._flock = (fd, exclusive)
+                yield
+            finally:
+                self._flock = None
+                os.close(fd)  # closing the descriptor releases the flock
+
+    def _atomic_save(self, wb, path):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o644)
+            with os.fdopen(fd, 'wb') as f:
+                wb.save(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _ensure_files_exist(self):
+        os.makedirs(os.path.dirname(self.paths['workers']), exist_ok=True)
+        with self._file_lock(exclusive=True):
+            if not os.path.exists(self.paths['workers']):
+                self._atomic_save(_new_workbook(WORKER_HEADERS), self.paths['workers'])
+            if not os.path.exists(self.paths['tasks']):
+                self._atomic_save(_new_workbook(TASK_HEADERS), self.paths['tasks'])
+            if self._needs_ids():
+                self._assign_missing_ids()
+
+    def _needs_ids(self):
+        wb = load_workbook(self.paths['tasks'], read_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, ())
+            if len(header) < ID_COLUMN or header[ID_COLUMN - 1] != TASK_HEADERS[ID_COLUMN - 1]:
+                return True
+            return any(r[1] and (len(r) < ID_COLUMN or r[ID_COLUMN - 1] is None) for r in rows)
+        finally:
+            wb.close()
+
+    def _assign_missing_ids(self):
+        """Adds the Task ID column to legacy sheets and numbers rows that were added by hand."""
+        with self.transaction():
+            wb = self._open('tasks')
+            ws = wb.active
+            ws.cell(row=1, column=ID_COLUMN, value=TASK_HEADERS[ID_COLUMN - 1])
+            ids = [r[ID_COLUMN - 1] for r in ws.iter_rows(min_row=2, values_only=True) if r[1]]
+            next_id = max([self._next_id(wb)] + [int(i) + 1 for i in ids if i is not None])
+            for row in range(2, ws.max_row + 1):
+                if ws.cell(row=row, column=2).value and ws.cell(row=row, column=ID_COLUMN).value is None:
+                    ws.cell(row=row, column=ID_COLUMN, value=next_id)
+                    next_id += 1
+            self._set_next_id(wb, next_id)
+            self._index = None
+
+    def _next_id(self, wb):
+        props = wb.custom_doc_props
+        return props[NEXT_ID_PROPERTY].value if NEXT_ID_PROPERTY in props.names else 1
+
+    def _set_next_id(self, wb, value):
+        props = wb.custom_doc_props
+        if NEXT_ID_PROPERTY in props.names:
+            props[NEXT_ID_PROPERTY].value = value
+        else:
+            props.append(IntProperty(name=NEXT_ID_PROPERTY, value=value))
+
+    def _task_index(self, ws):
+        """id -> row for the open tasks sheet, rescanned only when the file changed since we indexed it."""
+        if self._index is None or self._index_signature != self.signature('tasks'):
+            self._index = {int(r[0]): row for row, r in enumerate(
+                ws.iter_rows(min_row=2, min_col=ID_COLUMN, max_col=ID_COLUMN, values_only=True), start=2) if r[0] is not None}
+            self._index_signature = self.signature('tasks')
+        return self._index
+
+    def _row_for(self, ws, task_id):
+        task_id = int(task_id)
+        row = self._task_index(ws).get(task_id)
+        if row is None or ws.cell(row=row, column=ID_COLUMN).value != task_id:
+            # Stale index (sheet edited elsewhere); rebuild from the open sheet
+            self._index = None
+            self._index_signature = None
+            row = self._task_index(ws).get(task_id)
+        if row is None:
+            raise KeyError(task_id)
+        return row
+
+    def signature(self, sheet):
+        # The inode changes on every atomic replace, even within one mtime tick
+        try:
+            st = os.stat(self.paths[sheet])
+        except FileNotFoundError:
+            return None  # archive not created yet
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _stream(self, sheet):
+        # Read-only mode parses the sheet XML incrementally instead of building every cell
+        with self._file_lock(exclusive=False):
+            if not os.path.exists(self.paths[sheet]):
+                return  # archive not created yet
+            wb = load_workbook(self.paths[sheet], read_only=True)
+            try:
+                ws = wb.active
+                ws.reset_dimensions()  # files saved by other tools can carry a stale <dimension>
+                for r in ws.iter_rows(min_row=2, values_only=True):
+                    r = r + (None,) * (ID_COLUMN - len(r))
+                    if sheet == 'workers':
+                        if r[0]:
+                            yield _worker_row(r)
+                    elif r[1]:
+                        if r[ID_COLUMN - 1] is None and sheet == 'tasks':
+                            raise _MissingIds()
+                        yield _task_row(r[ID_COLUMN - 1], r)
+            finally:
+                wb.close()
+
+    def iter_rows(self, sheet):
+        """Yields a sheet's rows lazily, numbering hand-added tasks on the way.
+
+        The shared lock is held while the generator is suspended, so consume it promptly
+        and from the thread that created it.
+        """
+        seen = set()
+        for attempt in range(2):
+            try:
+                for row in self._stream(sheet):
+                    if sheet == 'tasks':
+                        if row['id'] in seen:
+                            continue  # already yielded before the ids were assigned
+                        seen.add(row['id'])
+                    yield row
+                return
+            except _MissingIds:
+                if attempt:
+                    raise RuntimeError('tasks sheet still has rows without a Task ID')
+                with self._file_lock(exclusive=True):
+                    if self._needs_ids():
+                        self._assign_missing_ids()
+
+    def load(self, sheet):
+        return list(self.iter_rows(sheet))
+
+    @contextmanager
+    def transaction(self):
+        """Holds the exclusive lock, loads each touched workbook once and saves it once on exit."""
+        with self._file_lock(exclusive=True):
+            if self._tx is not None:
+                yield
+                return
+            self._tx = {}
+            try:
+                yield
+                for sheet, wb in self._tx.items():
+                    self._atomic_save(wb, self.paths[sheet])
+                    if sheet == 'tasks' and self._index is not None:
+                        self._index_signature = self.signature('tasks')
+            except BaseException:
+                self._index = None
+                raise
+            finally:
+                self._tx = None
+
+    def _open(self, sheet):
+        if sheet not in self._tx:
+            self._tx[sheet] = load_workbook(self.paths[sheet])
+        return self._tx[sheet]
+
+    def add_worker(self, name, job_title, date_working):
+        with self.transaction():
+            self._open('workers').active.append([name, job_title, date_working])
+
+    def delete_worker(self, name):
+        with self.transaction():
+            ws = self._open('workers').active
+            for row in range(2, ws.max_row + 1):
+                if ws.cell(row=row, column=1).value == name:
+                    ws.delete_rows(row)
+                    break
+
+    def add_task(self, urgency, description, date_assigned):
+        with self.transaction():
+            wb = self._open('tasks')
+            ws = wb.active
+            index = self._task_index(ws)
+            task_id = self._next_id(wb)
+            self._set_next_id(wb, task_id + 1)
+            ws.append([urgency, description, date_assigned, '', '', task_id])
+            index[task_id] = ws.max_row
+        return task_id
+
+    def update_task(self, task_id, **fields):
+        with self.transaction():
+            ws = self._open('tasks').active
+            row = self._row_for(ws, task_id)
+            for field, value in fields.items():
+                ws.cell(row=row, column=TASK_COLUMNS[field], value=value)
+
+    def delete_task(self, task_id):
+        with self.transaction():
+            ws = self._open('tasks').active
+            row = self._row_for(ws, task_id)
+            ws.delete_rows(row)
+            index = self._index
+            del index[int(task_id)]
+            for other, other_row in index.items():
+                if other_row > row:
+                    index[other] = other_row - 1
+
+    def archive_tasks(self, task_ids):
+        """Moves the given tasks to the archive workbook; returns how many moved."""
+        ids = {int(i) for i in task_ids}
+        with self.transaction():
+            # Archive is opened (and therefore saved) first: a crash between the two
+            # saves leaves a duplicate in the archive rather than losing the task.
+            if os.path.exists(self.paths['archive']):
+                archive = self._open('archive').active
+            else:
+                self._tx['archive'] = _new_workbook(TASK_HEADERS)
+                archive = self._tx['archive'].active
+            ws = self._open('tasks').active
+            kept, moved = [], 0
+            for r in ws.iter_rows(min_row=2, values_only=True):
+                if r[ID_COLUMN - 1] in ids:
+                    archive.append(r)
+                    moved += 1
+                else:
+                    kept.append(r)
+            # Rewriting the sheet once is O(rows); deleting row by row would be O(rows x moved)
+            ws.delete_rows(2, ws.max_row)
+            for r in kept:
+                ws.append(r)
+            self._index = None
+        return moved
+
+    def export_xlsx(self, sheet, target):
+        with self._file_lock(exclusive=False):
+            if sheet == 'archive' and not os.path.exists(self.paths[sheet]):
+                wb = _new_workbook(TASK_HEADERS)
+            else:
+                wb = load_workbook(self.paths[sheet])
+        wb.save(target)
+
+
+class SQLiteStorage:
+    """Single-file SQLite storage; mutations are indexed single-row statements."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS workers (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            job_title TEXT,
+            date_working TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_workers_name ON workers(name);
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            urgency,
+            description TEXT NOT NULL,
+            date_assigned TEXT,
+            date_completed TEXT,
+            assigned_to TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_assigned_to ON tasks(assigned_to);
+        CREATE INDEX IF NOT EXISTS idx_tasks_date_completed ON tasks(date_completed);
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            urgency,
+            description TEXT NOT NULL,
+            date_assigned TEXT,
+            date_completed TEXT,
+            assigned_to TEXT
+        );
+        -- Per-table change counters, shared by every process that opens the file
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('workers', 0), ('tasks', 0), ('archive', 0);
+    """
+
+    # Sheet name -> table
+    TABLES = {'workers': 'workers', 'tasks': 'tasks', 'archive': 'tasks_archive'}
+
+    VERSION_TRIGGER = """
+        CREATE TRIGGER IF NOT EXISTS {table}_{op}_version AFTER {op} ON {table}
+        BEGIN UPDATE meta SET value = value + 1 WHERE key = '{sheet}'; END;
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._connect()
+        self._conn.executescript(self.SCHEMA)
+        for sheet, table in self.TABLES.items():
+            for op in ('INSERT', 'UPDATE', 'DELETE'):
+                self._conn.executescript(self.VERSION_TRIGGER.format(table=table, sheet=sheet, op=op))
+        if hasattr(os, 'register_at_fork'):
+            # SQLite connections must not be used across fork (gunicorn --preload)
+            os.register_at_fork(after_in_child=self._connect)
+
+    def _connect(self):
+        # timeout: other gunicorn workers may briefly hold the write lock
+        self._conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            if self._conn.in_transaction:
+                yield
+                return
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _execute_one(self, sql, params, task_id):
+        with self._lock:
+            if self._conn.execute(sql, params).rowcount == 0:
+                raise KeyError(task_id)
+
+    def is_empty(self):
+        return not self._execute('SELECT 1 FROM workers UNION ALL SELECT 1 FROM tasks LIMIT 1')
+
+    def signature(self, sheet):
+        return self._execute('SELECT value FROM meta WHERE key = ?', (sheet,))[0][0]
+
+    def load(self, sheet):
+        if sheet == 'workers':
+            return [_worker_row(r) for r in self._execute('SELECT name, job_title, date_working FROM workers ORDER BY id')]
+        return [_task_row(r[5], r) for r in self._execute(
+            f'SELECT urgency, description, date_assigned, date_completed, assigned_to, id FROM {self.TABLES[sheet]} ORDER BY id')]
+
+    def iter_rows(self, sheet):
+        # Rows are fetched in one go; a cursor left open would pin the shared connection
+        return iter(self.load(sheet))
+
+    def add_worker(self, name, job_title, date_working):
+        self._execute('INSERT INTO workers (name, job_title, date_working) VALUES (?, ?, ?)', (name, job_title, date_working))
+
+    def delete_worker(self, name):
+        self._execute('DELETE FROM workers WHERE id = (SELECT MIN(id) FROM workers WHERE name = ?)', (name,))
+
+    def add_task(self, urgency, description, date_assigned):
+        with self._lock:
+            return self._conn.execute('INSERT INTO tasks (urgency, description, date_assigned, date_completed, assigned_to) VALUES (?, ?, ?, NULL, NULL)',
+                                      (urgency, description, date_assigned)).lastrowid
+
+    def update_task(self, task_id, **fields):
+        for field in fields:
+            if field not in TASK_COLUMNS:
+                raise KeyError(field)
+        assignments = ', '.join(f'{field} = ?' for field in fields)
+        self._execute_one(f'UPDATE tasks SET {assignments} WHERE id = ?', (*fields.values(), int(task_id)), task_id)
+
+    def delete_task(self, task_id):
+        self._execute_one('DELETE FROM tasks WHERE id = ?', (int(task_id),), task_id)
+
+    def archive_tasks(self, task_ids):
+        ids = [int(i) for i in task_ids]
+        columns = 'id, urgency, description, date_assigned, date_completed, assigned_to'
+        moved = 0
+        with self.transaction():
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ', '.join('?' * len(chunk))
+                self._conn.execute(f'INSERT OR REPLACE INTO tasks_archive ({columns}) SELECT {columns} FROM tasks WHERE id IN ({marks})', chunk)
+                moved += self._conn.execute(f'DELETE FROM tasks WHERE id IN ({marks})', chunk).rowcount
+        return moved
+
+    def import_xlsx(self, workers_file, tasks_file):
+        """Loads the legacy spreadsheets into the database in one transaction."""
+        workers = [r for r in load_workbook(workers_file, read_only=True).active.iter_rows(min_row=2, values_only=True) if r[0]]
+        tasks = [r for r in load_workbook(tasks_file, read_only=True).active.iter_rows(min_row=2, values_only=True) if r[1]]
+        with self.transaction():
+            self._conn.executemany('INSERT INTO workers (name, job_title, date_working) VALUES (?, ?, ?)',
+                                   [(tuple(r) + (None,) * 3)[:3] for r in workers])
+            # Keeps the spreadsheet's Task IDs; legacy rows without one get a fresh id
+            self._conn.executemany('INSERT INTO tasks (urgency, description, date_assigned, date_completed, assigned_to, id) VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(tuple(r) + (None,) * 6)[:6] for r in tasks])
+
+    def export_xlsx(self, sheet, target):
+        if sheet == 'workers':
+            rows = [(w['name'], w['job_title'], w['date_working']) for w in self.load('workers')]
+            _new_workbook(WORKER_HEADERS, rows).save(target)
+        else:
+            rows = [(t['urgency'], t['description'], t['date_assigned'], t['date_completed'], t['assigned_to'], t['id']) for t in self.load(sheet)]
+            _new_workbook(TASK_HEADERS, rows).save(target)